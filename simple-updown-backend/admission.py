@@ -0,0 +1,176 @@
+import os
+import asyncio
+import time
+from typing import Dict, Optional
+from fastapi.responses import JSONResponse
+from tracing import span
+from utils import get_ip_prefix
+
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "5"))
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: int) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """초당 rate 바이트를 허용하는 토큰 버킷 (부족분은 대기 후 상환)"""
+
+    def __init__(self, rate: int, capacity: Optional[int] = None) -> None:
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    async def consume(self, amount: int) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+
+class TransferLimiter:
+    """전역 / 클라이언트(ip_prefix)별 동시 전송 수와 대역폭 제한"""
+
+    def __init__(self, kind: str, max_active: int, max_per_client: int,
+                 rate: int = 0, rate_per_client: int = 0) -> None:
+        self.kind = kind
+        self.max_active = max_active
+        self.max_per_client = max_per_client
+        self.rate = rate
+        self.rate_per_client = rate_per_client
+        self.active = 0
+        self.per_client: Dict[str, int] = {}
+        self._condition = asyncio.Condition()
+        self._bucket = TokenBucket(rate) if rate > 0 else None
+        self._client_buckets: Dict[str, TokenBucket] = {}
+
+    def _admissible(self, client: str) -> bool:
+        return (
+            (self.max_active <= 0 or self.active < self.max_active)
+            and (self.max_per_client <= 0 or self.per_client.get(client, 0) < self.max_per_client)
+        )
+
+    async def acquire(self, client: str) -> None:
+        """전역 또는 클라이언트 한도를 넘으면 ADMISSION_QUEUE_TIMEOUT까지 대기, 그래도 자리가 없으면 거절"""
+        async with self._condition:
+            try:
+                await asyncio.wait_for(
+                    self._condition.wait_for(lambda: self._admissible(client)),
+                    timeout=ADMISSION_QUEUE_TIMEOUT,
+                )
+            except asyncio.TimeoutError:
+                if self.max_per_client > 0 and self.per_client.get(client, 0) >= self.max_per_client:
+                    raise AdmissionRejected(
+                        429, f"Too many concurrent {self.kind}s from this client", ADMISSION_RETRY_AFTER
+                    )
+                raise AdmissionRejected(
+                    503, f"Server busy: too many concurrent {self.kind}s", ADMISSION_RETRY_AFTER
+                )
+            self.active += 1
+            self.per_client[client] = self.per_client.get(client, 0) + 1
+
+    async def release(self, client: str) -> None:
+        async with self._condition:
+            self.active -= 1
+            self._release_client(client)
+            # 대기 조건이 클라이언트마다 다르므로 모두 깨워 각자 다시 확인
+            self._condition.notify_all()
+
+    def _release_client(self, client: str) -> None:
+        count = self.per_client.get(client, 0) - 1
+        if count > 0:
+            self.per_client[client] = count
+        else:
+            self.per_client.pop(client, None)
+            self._client_buckets.pop(client, None)
+
+    async def throttle(self, client: str, amount: int) -> None:
+        if amount <= 0:
+            return
+        if self.rate_per_client > 0:
+            bucket = self._client_buckets.get(client)
+            if bucket is None:
+                bucket = self._client_buckets[client] = TokenBucket(self.rate_per_client)
+            await bucket.consume(amount)
+        if self._bucket is not None:
+            await self._bucket.consume(amount)
+
+
+upload_limiter = TransferLimiter(
+    "upload",
+    max_active=int(os.getenv("ADMISSION_MAX_UPLOADS", "4")),
+    max_per_client=int(os.getenv("ADMISSION_MAX_UPLOADS_PER_CLIENT", "3")),
+    rate=int(os.getenv("UPLOAD_RATE_LIMIT", "0")),
+    rate_per_client=int(os.getenv("UPLOAD_RATE_LIMIT_PER_CLIENT", "0")),
+)
+download_limiter = TransferLimiter(
+    "download",
+    max_active=int(os.getenv("ADMISSION_MAX_DOWNLOADS", "16")),
+    max_per_client=int(os.getenv("ADMISSION_MAX_DOWNLOADS_PER_CLIENT", "4")),
+    rate=int(os.getenv("DOWNLOAD_RATE_LIMIT", "0")),
+    rate_per_client=int(os.getenv("DOWNLOAD_RATE_LIMIT_PER_CLIENT", "0")),
+)
+
+
+def _select_limiter(scope) -> Optional[TransferLimiter]:
+    path = scope.get("path", "")
+    method = scope.get("method", "")
+    if method == "POST" and path == "/upload/":
+        return upload_limiter
+    if path.startswith("/download/"):
+        return download_limiter
+    return None
+
+
+class AdmissionMiddleware:
+    """업로드/다운로드 동시성 제한 및 대역폭 조절 ASGI 미들웨어
+
+    multipart 본문을 파싱하기 전에 적용해야 하므로 라우터 의존성이 아닌 미들웨어로 둔다.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        limiter = _select_limiter(scope) if scope["type"] == "http" else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        client_host = scope["client"][0] if scope.get("client") else "unknown"
+        client = get_ip_prefix(client_host)
+        try:
+            with span(f"admission.{limiter.kind}"):
+                await limiter.acquire(client)
+        except AdmissionRejected as e:
+            response = JSONResponse(
+                status_code=e.status_code,
+                content={"detail": e.detail},
+                headers={"Retry-After": str(e.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        async def throttled_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                await limiter.throttle(client, len(message.get("body", b"")))
+            return message
+
+        async def throttled_send(message):
+            if message["type"] == "http.response.body":
+                await limiter.throttle(client, len(message.get("body", b"")))
+            await send(message)
+
+        try:
+            await self.app(scope, throttled_receive, throttled_send)
+        finally:
+            await limiter.release(client)
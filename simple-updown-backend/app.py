@@ -1,27 +1,72 @@
+import lifecycle
 from dotenv import load_dotenv
 
 # 반드시 스토리지 초기화 전에 호출
 load_dotenv()
 
+import os
+import asyncio
 import datetime
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from admission import AdmissionMiddleware
+from change_feed import CHANGE_LOG_RETENTION
+from deletion import REAPER_INTERVAL_SECONDS, reap_tombstones
 from dependencies import db, storage
-from routers import files, upload, download, thumbnail
+from digests import fill_pending_digests
+from routers import files, upload, download, thumbnail, health, admin, stats
+from tracing import TracingMiddleware
+
+RECONCILE_BATCH_SIZE = 200
+RECONCILE_START_DELAY = float(os.getenv("RECONCILE_START_DELAY", "5"))
+_RECONCILE_CHECKPOINT = "reconcile_checkpoint"
 
 
 async def cleanup_orphaned_files():
+    """스토리지에 없는 메타데이터 정리
+
+    id 순으로 배치 단위로 검사하고 배치마다 체크포인트를 저장해
+    재시작 시 중단된 지점부터 이어서 진행한다.
+    """
+    if lifecycle.state["reconcile_running"]:
+        return
+    lifecycle.state["reconcile_running"] = True
     deleted_count = 0
-    for doc_id, metadata in (await db.list_all()).items():
-        file_hash = metadata.get("hash", {}).get("sha256")
-        if not file_hash or not storage.file_exists(file_hash):
-            await db.delete(doc_id)
-            deleted_count += 1
-    print(f"정리 완료: {deleted_count}개의 메타데이터 항목이 삭제되었습니다.")
+    checked_count = 0
+    try:
+        after_id = await db.get_state(_RECONCILE_CHECKPOINT) or ""
+        while True:
+            batch = await db.list_batch(after_id, RECONCILE_BATCH_SIZE)
+            if not batch:
+                break
+            for doc_id, metadata in batch:
+                file_hash = metadata.get("hash", {}).get("sha256")
+                if not file_hash or not await run_in_threadpool(storage.file_exists, file_hash):
+                    await db.delete(doc_id)
+                    deleted_count += 1
+            checked_count += len(batch)
+            after_id = batch[-1][0]
+            await db.set_state(_RECONCILE_CHECKPOINT, after_id)
+        await db.set_state(_RECONCILE_CHECKPOINT, "")
+        print(f"정리 완료: {checked_count}개 검사, {deleted_count}개의 메타데이터 항목이 삭제되었습니다.")
+    finally:
+        lifecycle.state["reconcile_running"] = False
+
+
+async def _deferred_startup():
+    """요청 수신 시작 후 스토리지 백엔드 로드, 정합성 검사, (write-behind 시) 복제 워커를 백그라운드로 수행"""
+    await asyncio.sleep(RECONCILE_START_DELAY)
+    await run_in_threadpool(storage.load)
+    jobs = [cleanup_orphaned_files()]
+    if hasattr(storage, "replicate"):
+        from write_behind_storage import run_replication_worker
+        jobs.append(run_replication_worker(storage))
+    await asyncio.gather(*jobs)
 
 
 async def delete_expired_files():
@@ -44,36 +89,42 @@ async def delete_expired_files():
             expire_time = datetime.datetime.fromisoformat(expire_time_str)
             if current_time > expire_time:
                 expired_count += 1
-                file_hash = metadata.get("hash", {}).get("sha256")
-                if file_hash:
-                    storage.delete_file(file_hash)
                 expired_docs.append(doc_id)
         except (ValueError, TypeError):
             error_count += 1
             expired_docs.append(doc_id)
 
-    for doc_id in expired_docs:
-        await db.delete(doc_id)
+    # 삭제 표시만 남기고 스토리지 삭제는 리퍼(reap_tombstones)가 일괄 처리
+    await db.delete_many(expired_docs, reason="expire")
 
     print(f"만료 파일 검사 완료 - 전체: {total_count}, 만료됨: {expired_count}, 오류: {error_count}")
     if expired_docs:
-        print(f"{len(expired_docs)}개의 만료된 파일 삭제됨")
+        print(f"{len(expired_docs)}개의 만료된 파일 삭제 예정")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await db.init()
-    await cleanup_orphaned_files()
+    startup_task = asyncio.create_task(_deferred_startup())
     scheduler = AsyncIOScheduler()
     scheduler.add_job(delete_expired_files, 'interval', minutes=1)
     scheduler.add_job(cleanup_orphaned_files, 'interval', hours=1)
+    scheduler.add_job(fill_pending_digests, 'interval', seconds=30)
+    scheduler.add_job(reap_tombstones, 'interval', seconds=REAPER_INTERVAL_SECONDS)
+    scheduler.add_job(db.prune_changes, 'interval', hours=1, args=[CHANGE_LOG_RETENTION])
     scheduler.start()
+    lifecycle.mark_ready()
     yield
+    lifecycle.mark_not_ready()
+    startup_task.cancel()
     scheduler.shutdown()
 
 
 app = FastAPI(title="File Storage Service", lifespan=lifespan)
 
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(lifecycle.FirstRequestTimerMiddleware)
+app.add_middleware(TracingMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -84,10 +135,13 @@ app.add_middleware(
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+app.include_router(health.router)
 app.include_router(files.router)
 app.include_router(upload.router)
 app.include_router(download.router)
 app.include_router(thumbnail.router)
+app.include_router(admin.router)
+app.include_router(stats.router)
 
 
 @app.get("/")
@@ -108,7 +162,7 @@ async def serve_files_path(path: str):
 @app.exception_handler(404)
 async def not_found_handler(request: Request, exc: HTTPException):
     if request.url.path.startswith("/api/") or request.url.path.startswith("/download/"):
-        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+        return JSONResponse(status_code=404, content={"detail": getattr(exc, "detail", None) or "Not Found"})
     return FileResponse('static/index.html')
 
 
@@ -0,0 +1,110 @@
+import os
+import asyncio
+import zipfile
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Set
+from starlette.concurrency import run_in_threadpool
+
+ARCHIVE_READ_AHEAD_CHUNKS = int(os.getenv("ARCHIVE_READ_AHEAD_CHUNKS", "8"))
+
+_END_OF_ENTRY = object()
+
+
+class ArchiveEntryError(Exception):
+    """엔트리에서 읽은 바이트 수가 메타데이터의 크기와 다름 (스트림 중단)"""
+
+
+class _ZipOutput:
+    """zipfile이 쓰는 바이트를 모아두는 비탐색(non-seekable) 출력 버퍼
+
+    tell/seek이 없으므로 zipfile은 데이터 디스크립터 방식으로 스트리밍 기록한다.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def unique_entry_name(name: str, used: Set[str]) -> str:
+    """아카이브 내 중복 파일명에 ' (n)' 접미사 부여"""
+    name = name.replace("\\", "/").lstrip("/") or "unnamed"
+    candidate = name
+    base, ext = os.path.splitext(name)
+    counter = 1
+    while candidate in used:
+        candidate = f"{base} ({counter}){ext}"
+        counter += 1
+    used.add(candidate)
+    return candidate
+
+
+async def _read_ahead(openers: List[Callable[[], Iterator[bytes]]], queue: asyncio.Queue) -> None:
+    """다음 엔트리까지 포함해 저장소 청크를 미리 읽어 큐에 적재"""
+    try:
+        for opener in openers:
+            iterator = await run_in_threadpool(lambda: iter(opener()))
+            while True:
+                chunk = await run_in_threadpool(next, iterator, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    await queue.put(chunk)
+            await queue.put(_END_OF_ENTRY)
+    except Exception as e:
+        await queue.put(e)
+
+
+async def stream_zip(entries: List[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """entries(name, date_time, compress_type, open, size)를 ZIP64 아카이브로 스트리밍
+
+    아카이브 전체를 메모리나 임시 파일에 만들지 않고 엔트리 청크를 쓰는 즉시 내보낸다.
+    size가 주어진 엔트리는 읽은 바이트 수가 다르면 ArchiveEntryError로 스트림을 중단한다.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=ARCHIVE_READ_AHEAD_CHUNKS)
+    producer = asyncio.create_task(_read_ahead([entry["open"] for entry in entries], queue))
+    output = _ZipOutput()
+    zf = zipfile.ZipFile(output, mode="w", allowZip64=True)
+    try:
+        for entry in entries:
+            zinfo = zipfile.ZipInfo(entry["name"], date_time=entry["date_time"])
+            zinfo.compress_type = entry["compress_type"]
+            zinfo.external_attr = 0o644 << 16
+            deflated = zinfo.compress_type != zipfile.ZIP_STORED
+            read_size = 0
+            with zf.open(zinfo, mode="w", force_zip64=True) as dest:
+                while True:
+                    chunk = await queue.get()
+                    if chunk is _END_OF_ENTRY:
+                        break
+                    if isinstance(chunk, Exception):
+                        raise chunk
+                    read_size += len(chunk)
+                    if deflated:
+                        await run_in_threadpool(dest.write, chunk)
+                    else:
+                        dest.write(chunk)
+                    data = output.drain()
+                    if data:
+                        yield data
+                expected_size = entry.get("size")
+                if expected_size is not None and read_size != expected_size:
+                    raise ArchiveEntryError(
+                        f"{entry['name']}: read {read_size} bytes, expected {expected_size}"
+                    )
+            data = output.drain()
+            if data:
+                yield data
+        zf.close()
+        yield output.drain()
+    finally:
+        producer.cancel()
@@ -0,0 +1,33 @@
+import os
+import asyncio
+
+# 변경 로그 보존 개수, 이보다 오래된 커서로 요청하면 전체 재조회(reset) 안내
+CHANGE_LOG_RETENTION = int(os.getenv("CHANGE_LOG_RETENTION", "10000"))
+
+
+class ChangeNotifier:
+    """변경 로그 기록 시 대기 중인 SSE 스트림을 깨우는 알림
+
+    조회 전에 listen()으로 이벤트를 받아두고 조회 후 wait()해야
+    그 사이에 기록된 변경을 놓치지 않는다.
+    """
+
+    def __init__(self) -> None:
+        self._event = asyncio.Event()
+
+    def notify(self) -> None:
+        self._event.set()
+        self._event = asyncio.Event()
+
+    def listen(self) -> asyncio.Event:
+        return self._event
+
+    async def wait(self, event: asyncio.Event, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+change_notifier = ChangeNotifier()
@@ -0,0 +1,327 @@
+import os
+import hashlib
+import sqlite3
+import threading
+import uuid
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    from fastcdc import fastcdc
+except ImportError:
+    fastcdc = None
+
+_DEFAULT_CHUNK_DIR = os.getenv(
+    "CHUNK_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "chunks")
+)
+CHUNK_MIN_SIZE = int(os.getenv("CHUNK_MIN_SIZE", str(16 * 1024)))
+CHUNK_AVG_SIZE = int(os.getenv("CHUNK_AVG_SIZE", str(64 * 1024)))
+CHUNK_MAX_SIZE = int(os.getenv("CHUNK_MAX_SIZE", str(256 * 1024)))
+# 한 트랜잭션에서 참조를 기록할 청크 수
+_COMMIT_BATCH = 64
+# 업로드 중(미확정) 매니페스트 키 접두어
+_STAGING_PREFIX = "staging:"
+# 다운로드 시 작은 청크를 모아 내보내는 크기
+_STREAM_BUFFER_SIZE = 1024 * 1024
+
+_GEAR = [int.from_bytes(hashlib.sha256(bytes([i])).digest()[:8], "big") for i in range(256)]
+_MASK64 = (1 << 64) - 1
+
+
+def _gear_cut(buf: bytearray, min_size: int, avg_size: int, max_size: int) -> int:
+    """Gear 롤링 해시로 buf 앞부분의 청크 경계 위치 반환"""
+    length = len(buf)
+    if length <= min_size:
+        return length
+    end = min(length, max_size)
+    bits = max(avg_size.bit_length() - 1, 1)
+    mask = ((1 << bits) - 1) << (64 - bits)
+    h = 0
+    # Gear 해시는 최근 64바이트에만 의존하므로 min_size 직전 64바이트부터 계산
+    for i in range(max(0, min_size - 64), end):
+        h = ((h << 1) + _GEAR[buf[i]]) & _MASK64
+        if i >= min_size and not h & mask:
+            return i + 1
+    return end
+
+
+def iter_content_chunks(file_path: str, min_size: int = CHUNK_MIN_SIZE,
+                        avg_size: int = CHUNK_AVG_SIZE, max_size: int = CHUNK_MAX_SIZE) -> Iterator[bytes]:
+    """파일을 내용 기반 청크(content-defined chunking)로 분할
+
+    fastcdc 패키지가 있으면 사용하고, 없으면 순수 파이썬 Gear 구현으로 대체한다.
+    """
+    if fastcdc is not None:
+        for chunk in fastcdc(file_path, min_size=min_size, avg_size=avg_size, max_size=max_size, fat=True):
+            yield bytes(chunk.data)
+        return
+
+    buf = bytearray()
+    eof = False
+    with open(file_path, "rb") as f:
+        while True:
+            while not eof and len(buf) < max_size:
+                block = f.read(max_size)
+                if not block:
+                    eof = True
+                else:
+                    buf += block
+            if not buf:
+                return
+            cut = _gear_cut(buf, min_size, avg_size, max_size)
+            yield bytes(buf[:cut])
+            del buf[:cut]
+
+
+class ChunkStorage:
+    """청크 단위 중복 제거 저장소
+
+    업로드를 내용 기반 청크로 나눠 청크 해시별로 한 번만 저장하고,
+    파일별 매니페스트(청크 순서)와 청크 참조 수를 SQLite 인덱스에 기록한다.
+    참조가 0이 된 청크는 collect_garbage()에서 삭제된다.
+    """
+
+    # 파일 단위 압축은 청크 경계를 무너뜨려 중복 제거를 막으므로 사용하지 않음
+    compress_at_rest = False
+
+    def __init__(self, chunk_dir: str = _DEFAULT_CHUNK_DIR) -> None:
+        self.upload_dir = chunk_dir
+        os.makedirs(chunk_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(chunk_dir, "chunk_index.db"), timeout=30, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                refcount INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_chunks_unreferenced ON chunks(hash) WHERE refcount <= 0;
+            CREATE TABLE IF NOT EXISTS manifests (
+                file_hash TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                chunk_hash TEXT NOT NULL,
+                PRIMARY KEY (file_hash, seq)
+            );
+            CREATE TABLE IF NOT EXISTS chunk_files (
+                file_hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                chunk_count INTEGER NOT NULL
+            );
+        """)
+        # 이전 프로세스에서 중단된 업로드의 참조 정리
+        staging_keys = self._conn.execute(
+            "SELECT DISTINCT file_hash FROM manifests WHERE file_hash LIKE ?", (f"{_STAGING_PREFIX}%",)
+        ).fetchall()
+        for (staging_key,) in staging_keys:
+            self._release_locked(staging_key)
+        self._conn.commit()
+
+    def _chunk_path(self, chunk_hash: str) -> str:
+        return os.path.join(self.upload_dir, chunk_hash[:2], chunk_hash[2:4], chunk_hash)
+
+    def _write_chunk(self, chunk_hash: str, data: bytes) -> None:
+        path = self._chunk_path(chunk_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _reference_chunks(self, file_hash: str, start_seq: int, batch: List[Tuple[str, bytes]]) -> None:
+        # GC와 같은 락 안에서 청크 존재 확인/기록과 참조 증가를 함께 처리
+        with self._lock:
+            try:
+                for offset, (chunk_hash, data) in enumerate(batch):
+                    row = self._conn.execute(
+                        "SELECT 1 FROM chunks WHERE hash = ?", (chunk_hash,)
+                    ).fetchone()
+                    if row is None:
+                        self._write_chunk(chunk_hash, data)
+                        self._conn.execute(
+                            "INSERT INTO chunks (hash, size, refcount) VALUES (?, ?, 1)",
+                            (chunk_hash, len(data)),
+                        )
+                    else:
+                        self._conn.execute(
+                            "UPDATE chunks SET refcount = refcount + 1 WHERE hash = ?", (chunk_hash,)
+                        )
+                    self._conn.execute(
+                        "INSERT INTO manifests (file_hash, seq, chunk_hash) VALUES (?, ?, ?)",
+                        (file_hash, start_seq + offset, chunk_hash),
+                    )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def upload_file(self, file_path: str, file_hash: str) -> bool:
+        if self.file_exists(file_hash):
+            return True
+        # 동시 업로드가 서로의 매니페스트를 건드리지 않도록 임시 키로 기록 후 확정
+        staging_key = f"{_STAGING_PREFIX}{uuid.uuid4().hex}"
+        seq = 0
+        size = 0
+        batch: List[Tuple[str, bytes]] = []
+        try:
+            for data in iter_content_chunks(file_path):
+                batch.append((hashlib.sha256(data).hexdigest(), data))
+                size += len(data)
+                if len(batch) >= _COMMIT_BATCH:
+                    self._reference_chunks(staging_key, seq, batch)
+                    seq += len(batch)
+                    batch = []
+            if batch:
+                self._reference_chunks(staging_key, seq, batch)
+                seq += len(batch)
+            with self._lock:
+                if self._conn.execute(
+                    "SELECT 1 FROM chunk_files WHERE file_hash = ?", (file_hash,)
+                ).fetchone() is not None:
+                    self._release_locked(staging_key)
+                else:
+                    self._conn.execute(
+                        "UPDATE manifests SET file_hash = ? WHERE file_hash = ?", (file_hash, staging_key)
+                    )
+                    self._conn.execute(
+                        "INSERT INTO chunk_files (file_hash, size, chunk_count) VALUES (?, ?, ?)",
+                        (file_hash, size, seq),
+                    )
+                self._conn.commit()
+            return True
+        except Exception as e:
+            print(f"청크 저장 오류: {str(e)}")
+            with self._lock:
+                self._release_locked(staging_key)
+                self._conn.commit()
+            return False
+
+    def _release_locked(self, file_hash: str) -> bool:
+        """매니페스트를 지우고 청크 참조 수를 감소 (청크 파일은 GC에서 삭제, 호출자가 락/커밋 담당)"""
+        refs = self._conn.execute(
+            "SELECT chunk_hash, COUNT(*) FROM manifests WHERE file_hash = ? GROUP BY chunk_hash",
+            (file_hash,),
+        ).fetchall()
+        self._conn.executemany(
+            "UPDATE chunks SET refcount = refcount - ? WHERE hash = ?",
+            [(count, chunk_hash) for chunk_hash, count in refs],
+        )
+        self._conn.execute("DELETE FROM manifests WHERE file_hash = ?", (file_hash,))
+        deleted = self._conn.execute(
+            "DELETE FROM chunk_files WHERE file_hash = ?", (file_hash,)
+        ).rowcount
+        return deleted > 0
+
+    def delete_file(self, file_hash: str) -> bool:
+        with self._lock:
+            try:
+                deleted = self._release_locked(file_hash)
+                self._conn.commit()
+                return deleted
+            except Exception as e:
+                self._conn.rollback()
+                print(f"청크 파일 삭제 오류: {str(e)}")
+                return False
+
+    def delete_files(self, file_hashes: List[str]) -> Dict[str, str]:
+        """여러 파일의 청크 참조를 한 트랜잭션으로 해제 (청크 파일은 collect_garbage가 회수)"""
+        with self._lock:
+            try:
+                for file_hash in file_hashes:
+                    self._release_locked(file_hash)
+                self._conn.commit()
+                return {}
+            except Exception as e:
+                self._conn.rollback()
+                print(f"청크 파일 일괄 삭제 오류: {str(e)}")
+                return {file_hash: str(e) for file_hash in file_hashes}
+
+    def collect_garbage(self) -> Dict[str, int]:
+        """참조 수가 0인 청크 파일과 인덱스 행 삭제"""
+        deleted_chunks = 0
+        freed_bytes = 0
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT hash, size FROM chunks WHERE refcount <= 0"
+            ).fetchall()
+            for chunk_hash, size in rows:
+                try:
+                    os.remove(self._chunk_path(chunk_hash))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"청크 삭제 실패 ({chunk_hash}): {str(e)}")
+                    continue
+                self._conn.execute("DELETE FROM chunks WHERE hash = ? AND refcount <= 0", (chunk_hash,))
+                deleted_chunks += 1
+                freed_bytes += size
+            self._conn.commit()
+        if deleted_chunks:
+            print(f"청크 GC 완료: {deleted_chunks}개 청크, {freed_bytes} 바이트 회수")
+        return {"deleted_chunks": deleted_chunks, "freed_bytes": freed_bytes}
+
+    def file_exists(self, file_hash: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM chunk_files WHERE file_hash = ?", (file_hash,)
+            ).fetchone()
+        return row is not None
+
+    def _manifest(self, file_hash: str) -> Optional[List[str]]:
+        with self._lock:
+            if self._conn.execute(
+                "SELECT 1 FROM chunk_files WHERE file_hash = ?", (file_hash,)
+            ).fetchone() is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT chunk_hash FROM manifests WHERE file_hash = ? ORDER BY seq", (file_hash,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def stream_file(self, file_hash: str, chunk_size: int = _STREAM_BUFFER_SIZE):
+        manifest = self._manifest(file_hash)
+        if manifest is None:
+            print(f"스트리밍할 파일을 찾을 수 없음: {file_hash}")
+            return
+        buffer = bytearray()
+        for chunk_hash in manifest:
+            with open(self._chunk_path(chunk_hash), "rb") as f:
+                buffer += f.read()
+            if len(buffer) >= chunk_size:
+                yield bytes(buffer)
+                buffer.clear()
+        if buffer:
+            yield bytes(buffer)
+
+    def get_file_bytes(self, file_hash: str) -> Optional[bytes]:
+        if not self.file_exists(file_hash):
+            return None
+        try:
+            return b"".join(self.stream_file(file_hash))
+        except OSError as e:
+            print(f"파일 읽기 오류: {str(e)}")
+            return None
+
+    def dedup_stats(self) -> Dict[str, float]:
+        with self._lock:
+            file_count, logical_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM chunk_files"
+            ).fetchone()
+            chunk_count, physical_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM chunks WHERE refcount > 0"
+            ).fetchone()
+            garbage_chunks, garbage_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM chunks WHERE refcount <= 0"
+            ).fetchone()
+        return {
+            "files": file_count,
+            "logical_bytes": logical_bytes,
+            "chunks": chunk_count,
+            "physical_bytes": physical_bytes,
+            "dedup_ratio": round(logical_bytes / physical_bytes, 3) if physical_bytes else 1.0,
+            "saved_bytes": logical_bytes - physical_bytes,
+            "garbage_chunks": garbage_chunks,
+            "garbage_bytes": garbage_bytes,
+        }
@@ -0,0 +1,153 @@
+import os
+import gzip
+import shutil
+import tempfile
+import uuid
+import zlib
+from typing import Iterable, Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+STORAGE_COMPRESSION = os.getenv("STORAGE_COMPRESSION", "off").lower()
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "0"))
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", str(4 * 1024)))
+# 압축 결과가 원본의 90% 이상이면 원본 그대로 저장
+COMPRESSION_MAX_RATIO = 0.9
+
+_COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/xml",
+    "application/javascript",
+    "application/x-javascript",
+    "application/csv",
+    "application/x-yaml",
+    "application/yaml",
+    "application/sql",
+    "application/x-sh",
+}
+_COMPRESSIBLE_EXTENSIONS = {
+    ".txt", ".log", ".csv", ".tsv", ".json", ".jsonl", ".ndjson", ".xml",
+    ".yaml", ".yml", ".md", ".sql", ".html", ".htm", ".js", ".css", ".sh",
+}
+
+
+def is_compressible(content_type: Optional[str], filename: Optional[str]) -> bool:
+    mime = (content_type or "").split(";")[0].strip().lower()
+    if mime.startswith("text/") or mime in _COMPRESSIBLE_TYPES:
+        return True
+    ext = os.path.splitext((filename or "").lower())[1]
+    return ext in _COMPRESSIBLE_EXTENSIONS
+
+
+_PRECOMPRESSED_TYPES = {
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-7z-compressed",
+    "application/x-rar-compressed",
+    "application/vnd.rar",
+    "application/x-xz",
+    "application/x-bzip2",
+    "application/zstd",
+    "application/pdf",
+}
+_PRECOMPRESSED_EXTENSIONS = {
+    ".zip", ".gz", ".tgz", ".7z", ".rar", ".xz", ".bz2", ".zst", ".pdf",
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".mp3", ".mp4", ".mkv", ".mov",
+    ".webm", ".avi", ".ogg", ".flac", ".aac", ".docx", ".xlsx", ".pptx", ".apk", ".jar",
+}
+
+
+def is_precompressed(content_type: Optional[str], filename: Optional[str]) -> bool:
+    """이미 압축된 형식이라 재압축 이득이 없는 파일인지 확인"""
+    mime = (content_type or "").split(";")[0].strip().lower()
+    if mime.startswith(("video/", "audio/")) or mime in _PRECOMPRESSED_TYPES:
+        return True
+    if mime.startswith("image/") and mime not in ("image/svg+xml", "image/bmp", "image/tiff"):
+        return True
+    ext = os.path.splitext((filename or "").lower())[1]
+    return ext in _PRECOMPRESSED_EXTENSIONS
+
+
+def get_storage_encoding() -> Optional[str]:
+    """설정된 저장 압축 방식 반환 (zstd 미설치 시 gzip으로 대체)"""
+    if STORAGE_COMPRESSION == "zstd":
+        if zstandard is None:
+            return "gzip"
+        return "zstd"
+    if STORAGE_COMPRESSION == "gzip":
+        return "gzip"
+    return None
+
+
+def compress_file(src_path: str, encoding: str) -> Optional[str]:
+    """src_path를 압축한 임시 파일 경로 반환, 압축 이득이 없으면 None"""
+    dst_path = os.path.join(tempfile.gettempdir(), f"compress_{uuid.uuid4().hex}.tmp")
+    try:
+        with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+            if encoding == "zstd":
+                level = COMPRESSION_LEVEL or 3
+                zstandard.ZstdCompressor(level=level).copy_stream(src, dst)
+            else:
+                level = COMPRESSION_LEVEL or 6
+                with gzip.GzipFile(fileobj=dst, mode="wb", compresslevel=level, mtime=0) as gz:
+                    shutil.copyfileobj(src, gz, 1024 * 1024)
+        if os.path.getsize(dst_path) >= os.path.getsize(src_path) * COMPRESSION_MAX_RATIO:
+            os.unlink(dst_path)
+            return None
+        return dst_path
+    except Exception as e:
+        print(f"파일 압축 실패: {str(e)}")
+        if os.path.exists(dst_path):
+            os.unlink(dst_path)
+        return None
+
+
+def accepts_encoding(accept_encoding: Optional[str], encoding: str) -> bool:
+    """Accept-Encoding 헤더가 encoding을 허용하는지 확인 (q=0 은 거부로 처리)"""
+    if not accept_encoding:
+        return False
+    wildcard = False
+    for part in accept_encoding.lower().split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if token == encoding or (encoding == "gzip" and token == "x-gzip"):
+            return q > 0
+        if token == "*":
+            wildcard = q > 0
+    return wildcard
+
+
+def decompress_stream(chunks: Iterable[bytes], encoding: Optional[str]) -> Iterator[bytes]:
+    """저장된 (압축) 청크를 원본 바이트로 스트리밍 복원"""
+    if not encoding:
+        yield from chunks
+        return
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd 압축 파일을 읽으려면 zstandard 패키지가 필요합니다")
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+        for chunk in chunks:
+            data = decompressor.decompress(chunk)
+            if data:
+                yield data
+        return
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+    tail = decompressor.flush()
+    if tail:
+        yield tail
@@ -1,24 +1,66 @@
 import aiosqlite
+import datetime
+import json
+import re
+import time
 import uuid
 import os
-from typing import Optional, Dict, Any, Tuple
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, List, Tuple
+from change_feed import change_notifier
+from tracing import traced
 
 DB_PATH = os.getenv("DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "file_metadata.db"))
 
+# 기존 DB에 나중에 추가된 컬럼 (init 시 누락분을 ALTER TABLE로 보충)
+_ADDED_COLUMNS = {
+    "content_encoding": "TEXT",
+    "stored_size": "INTEGER",
+    "pending_digests": "TEXT",
+    "deleted_at": "TEXT",
+    "delete_attempts": "INTEGER",
+    "delete_retry_at": "REAL",
+    "delete_error": "TEXT",
+    "digest_attempts": "INTEGER",
+    "digest_retry_at": "REAL",
+    "digest_error": "TEXT",
+}
+
+
+# 파일명 검색어에서 FTS5 토큰으로 쓸 단어 추출
+_SEARCH_TOKEN = re.compile(r"\w+", re.UNICODE)
+# 순위(bm25)를 계산할 최신 후보 수, 흔한 접두어도 전체 매치를 채점하지 않도록 제한
+# (그보다 오래된 매치는 순위 없이 최신순으로 이어서 페이지 제공)
+SEARCH_CANDIDATE_LIMIT = 2000
+
+# 변경 로그에서 파일이 사라지는 연산 (payload 없음)
+_REMOVAL_OPS = {"delete", "expire"}
+
+# 집계 차원별 버킷 식 ({row}는 트리거의 new/old 또는 files), file_stats 테이블에 트리거로 누적
+_STATS_DIMENSIONS = {
+    "total": "''",
+    "content_type": "COALESCE(NULLIF({row}.content_type, ''), 'unknown')",
+    "uploader_prefix": "COALESCE(NULLIF({row}.uploader_ip, ''), 'unknown')",
+    # 만료 시각의 시 단위 버킷 (예: 2024-01-01T13)
+    "expiry_hour": "COALESCE(substr({row}.expire_time, 1, 13), 'never')",
+}
+_STATS_COLUMNS = "content_type, uploader_ip, expire_time, file_size, stored_size"
+
 
 class FileMetadataDB:
     def __init__(self, db_path: str = DB_PATH):
         self.db_path = db_path
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
 
+    @asynccontextmanager
     async def _connect(self):
-        db = await aiosqlite.connect(self.db_path, timeout=30)
-        await db.execute("PRAGMA journal_mode=WAL")
-        await db.execute("PRAGMA busy_timeout=30000")
-        return db
+        async with aiosqlite.connect(self.db_path, timeout=30) as db:
+            await db.execute("PRAGMA journal_mode=WAL")
+            await db.execute("PRAGMA busy_timeout=30000")
+            yield db
 
     async def init(self) -> None:
-        async with await self._connect() as db:
+        async with self._connect() as db:
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS files (
                     id TEXT PRIMARY KEY,
@@ -31,24 +73,222 @@ class FileMetadataDB:
                     expire_minutes INTEGER,
                     uploader_ip TEXT,
                     md5_hash TEXT,
-                    sha1_hash TEXT
+                    sha1_hash TEXT,
+                    content_encoding TEXT,
+                    stored_size INTEGER,
+                    pending_digests TEXT,
+                    deleted_at TEXT,
+                    delete_attempts INTEGER,
+                    delete_retry_at REAL,
+                    delete_error TEXT,
+                    digest_attempts INTEGER,
+                    digest_retry_at REAL,
+                    digest_error TEXT
                 )
             """)
+            await self._add_missing_columns(db)
             await db.execute(
                 "CREATE INDEX IF NOT EXISTS idx_file_hash ON files(file_hash)"
             )
+            await db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_pending_digests ON files(id) WHERE pending_digests IS NOT NULL"
+            )
+            # 삭제 표시(tombstone)된 행만 담는 부분 인덱스, 리퍼가 재시도 시각 순으로 조회
+            await db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_tombstones ON files(delete_retry_at) WHERE deleted_at IS NOT NULL"
+            )
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS file_changes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    op TEXT NOT NULL,
+                    doc_id TEXT,
+                    file_hash TEXT,
+                    payload TEXT,
+                    created_at TEXT
+                )
+            """)
+            await self._create_search_index(db)
+            await self._create_stats(db)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS maintenance_state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
             await db.commit()
 
-    async def insert(self, metadata: Dict[str, Any]) -> str:
+    async def _add_missing_columns(self, db) -> None:
+        async with db.execute("PRAGMA table_info(files)") as cursor:
+            existing = {row[1] for row in await cursor.fetchall()}
+        for column, column_type in _ADDED_COLUMNS.items():
+            if column not in existing:
+                await db.execute(f"ALTER TABLE files ADD COLUMN {column} {column_type}")
+
+    async def _create_search_index(self, db) -> None:
+        """files.file_name 외부 콘텐츠 FTS5 인덱스와 동기화 트리거 생성"""
+        async with db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'files_fts'"
+        ) as cursor:
+            existed = await cursor.fetchone() is not None
+        await db.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(
+                file_name,
+                content='files',
+                content_rowid='rowid',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3 4'
+            )
+        """)
+        await db.execute("""
+            CREATE TRIGGER IF NOT EXISTS files_fts_insert AFTER INSERT ON files BEGIN
+                INSERT INTO files_fts(rowid, file_name) VALUES (new.rowid, new.file_name);
+            END
+        """)
+        await db.execute("""
+            CREATE TRIGGER IF NOT EXISTS files_fts_delete AFTER DELETE ON files BEGIN
+                INSERT INTO files_fts(files_fts, rowid, file_name) VALUES ('delete', old.rowid, old.file_name);
+            END
+        """)
+        await db.execute("""
+            CREATE TRIGGER IF NOT EXISTS files_fts_update AFTER UPDATE OF file_name ON files BEGIN
+                INSERT INTO files_fts(files_fts, rowid, file_name) VALUES ('delete', old.rowid, old.file_name);
+                INSERT INTO files_fts(rowid, file_name) VALUES (new.rowid, new.file_name);
+            END
+        """)
+        if not existed:
+            # 외부 콘텐츠 인덱스에 없는 기존 행을 수정/삭제하면 동기화 트리거가 인덱스를 손상시키므로
+            # 생성 직후 같은 트랜잭션에서 기존 행을 색인
+            await db.execute("INSERT INTO files_fts(files_fts) VALUES ('rebuild')")
+
+    async def _create_stats(self, db) -> None:
+        """files 변경 시 차원별 파일 수/용량 집계를 갱신하는 file_stats 테이블과 트리거 생성"""
+        async with db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'file_stats'"
+        ) as cursor:
+            existed = await cursor.fetchone() is not None
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS file_stats (
+                dimension TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                file_count INTEGER NOT NULL DEFAULT 0,
+                total_bytes INTEGER NOT NULL DEFAULT 0,
+                stored_bytes INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (dimension, bucket)
+            )
+        """)
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_file_stats_bytes ON file_stats(dimension, total_bytes)"
+        )
+        # 삭제 표시된 행은 집계에서 빠지고, 표시가 해제(재업로드)되면 다시 더해짐
+        triggers = {
+            "files_stats_insert": f"""
+                AFTER INSERT ON files WHEN new.deleted_at IS NULL BEGIN
+                    {self._stats_add_sql("new")}
+                END
+            """,
+            "files_stats_delete": f"""
+                AFTER DELETE ON files WHEN old.deleted_at IS NULL BEGIN
+                    {self._stats_remove_sql("old")}
+                END
+            """,
+            "files_stats_update": f"""
+                AFTER UPDATE OF {_STATS_COLUMNS} ON files
+                WHEN old.deleted_at IS NULL AND new.deleted_at IS NULL BEGIN
+                    {self._stats_remove_sql("old")}
+                    {self._stats_add_sql("new")}
+                END
+            """,
+            "files_stats_tombstone": f"""
+                AFTER UPDATE OF deleted_at ON files
+                WHEN old.deleted_at IS NULL AND new.deleted_at IS NOT NULL BEGIN
+                    {self._stats_remove_sql("old")}
+                END
+            """,
+            "files_stats_restore": f"""
+                AFTER UPDATE OF deleted_at ON files
+                WHEN old.deleted_at IS NOT NULL AND new.deleted_at IS NULL BEGIN
+                    {self._stats_add_sql("new")}
+                END
+            """,
+        }
+        # 트리거 정의가 바뀌어도 기존 DB에 반영되도록 매 init마다 다시 생성
+        for name, body in triggers.items():
+            await db.execute(f"DROP TRIGGER IF EXISTS {name}")
+            await db.execute(f"CREATE TRIGGER {name} {body}")
+        if not existed:
+            await self._rebuild_stats(db)
+
+    @staticmethod
+    def _stats_add_sql(row: str) -> str:
+        return "\n".join(
+            f"""
+            INSERT INTO file_stats (dimension, bucket, file_count, total_bytes, stored_bytes)
+            VALUES ('{dimension}', {bucket.format(row=row)}, 1, COALESCE({row}.file_size, 0),
+                    COALESCE({row}.stored_size, {row}.file_size, 0))
+            ON CONFLICT (dimension, bucket) DO UPDATE SET
+                file_count = file_count + 1,
+                total_bytes = total_bytes + excluded.total_bytes,
+                stored_bytes = stored_bytes + excluded.stored_bytes;
+            """
+            for dimension, bucket in _STATS_DIMENSIONS.items()
+        )
+
+    @staticmethod
+    def _stats_remove_sql(row: str) -> str:
+        statements = [
+            f"""
+            UPDATE file_stats SET
+                file_count = file_count - 1,
+                total_bytes = total_bytes - COALESCE({row}.file_size, 0),
+                stored_bytes = stored_bytes - COALESCE({row}.stored_size, {row}.file_size, 0)
+            WHERE dimension = '{dimension}' AND bucket = {bucket.format(row=row)};
+            """
+            for dimension, bucket in _STATS_DIMENSIONS.items()
+        ]
+        # 비어버린 버킷 제거 (total 행은 항상 유지)
+        statements.append("DELETE FROM file_stats WHERE file_count <= 0 AND dimension != 'total';")
+        return "\n".join(statements)
+
+    @staticmethod
+    def _stats_select_sql() -> str:
+        """files 전체를 스캔해 file_stats와 같은 형태의 집계를 만드는 SELECT"""
+        parts = []
+        for dimension, bucket in _STATS_DIMENSIONS.items():
+            bucket_sql = bucket.format(row="files")
+            parts.append(f"""
+                SELECT '{dimension}' AS dimension, {bucket_sql} AS bucket, COUNT(*) AS file_count,
+                       COALESCE(SUM(COALESCE(file_size, 0)), 0) AS total_bytes,
+                       COALESCE(SUM(COALESCE(stored_size, file_size, 0)), 0) AS stored_bytes
+                FROM files
+                WHERE deleted_at IS NULL
+                {"" if dimension == "total" else f"GROUP BY {bucket_sql}"}
+            """)
+        return " UNION ALL ".join(parts)
+
+    async def _rebuild_stats(self, db) -> None:
+        await db.execute("DELETE FROM file_stats")
+        await db.execute(
+            f"INSERT INTO file_stats (dimension, bucket, file_count, total_bytes, stored_bytes) {self._stats_select_sql()}"
+        )
+
+    @traced("db.insert")
+    async def insert(self, metadata: Dict[str, Any]) -> Optional[str]:
+        """새 행의 id 반환, 같은 해시의 행이 이미 있어 등록되지 않았으면 None"""
         doc_id = str(uuid.uuid4())
-        async with await self._connect() as db:
+        async with self._connect() as db:
+            # 삭제 대기 중인 같은 해시는 재업로드로 대체 (리퍼와의 경합은 deletion_gate가 막음)
             await db.execute(
+                "DELETE FROM files WHERE file_hash = ? AND deleted_at IS NOT NULL",
+                (metadata.get("hash", {}).get("sha256"),),
+            )
+            cursor = await db.execute(
                 """
                 INSERT OR IGNORE INTO files
                     (id, file_hash, file_name, file_size, content_type,
                      upload_time, expire_time, expire_minutes, uploader_ip,
-                     md5_hash, sha1_hash)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                     md5_hash, sha1_hash, content_encoding, stored_size,
+                     pending_digests)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """,
                 (
                     doc_id,
@@ -62,42 +302,504 @@ class FileMetadataDB:
                     metadata.get("uploader_ip"),
                     metadata.get("hash", {}).get("md5"),
                     metadata.get("hash", {}).get("sha1"),
+                    metadata.get("content_encoding"),
+                    metadata.get("stored_size"),
+                    ",".join(metadata.get("pending_digests") or []) or None,
                 ),
             )
+            inserted = cursor.rowcount == 1
+            if inserted:
+                await self._record_change(db, "insert", doc_id)
             await db.commit()
+        if not inserted:
+            return None
+        change_notifier.notify()
         return doc_id
 
+    @traced("db.get_by_hash")
     async def get_by_hash(
         self, file_hash: str
     ) -> Optional[Tuple[str, Dict[str, Any]]]:
-        async with await self._connect() as db:
+        async with self._connect() as db:
             db.row_factory = aiosqlite.Row
             async with db.execute(
-                "SELECT * FROM files WHERE file_hash = ?", (file_hash,)
+                "SELECT * FROM files WHERE file_hash = ? AND deleted_at IS NULL", (file_hash,)
             ) as cursor:
                 row = await cursor.fetchone()
                 if row is None:
                     return None
                 return row["id"], self._row_to_metadata(row)
 
+    @traced("db.get_by_hashes")
+    async def get_by_hashes(
+        self, file_hashes: List[str]
+    ) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        """여러 해시를 한 연결에서 조회해 {file_hash: (id, metadata)} 반환 (없는 해시는 제외)"""
+        found: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        async with self._connect() as db:
+            db.row_factory = aiosqlite.Row
+            # 오래된 SQLite의 바인드 변수 한도(999)를 넘지 않도록 나눠서 조회
+            for start in range(0, len(file_hashes), 500):
+                batch = file_hashes[start:start + 500]
+                async with db.execute(
+                    f"""
+                    SELECT * FROM files
+                    WHERE file_hash IN ({",".join("?" * len(batch))}) AND deleted_at IS NULL
+                    """,
+                    batch,
+                ) as cursor:
+                    for row in await cursor.fetchall():
+                        found[row["file_hash"]] = (row["id"], self._row_to_metadata(row))
+        return found
+
+    @traced("db.list_all")
     async def list_all(self) -> Dict[str, Dict[str, Any]]:
-        async with await self._connect() as db:
+        async with self._connect() as db:
             db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM files") as cursor:
+            async with db.execute("SELECT * FROM files WHERE deleted_at IS NULL") as cursor:
                 rows = await cursor.fetchall()
                 return {row["id"]: self._row_to_metadata(row) for row in rows}
 
-    async def delete(self, doc_id: str) -> None:
-        async with await self._connect() as db:
-            await db.execute("DELETE FROM files WHERE id = ?", (doc_id,))
+    @traced("db.search")
+    async def search(
+        self, query: str, limit: int = 20, offset: int = 0
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """파일명 전문/접두어 검색
+
+        최신 후보 SEARCH_CANDIDATE_LIMIT개는 bm25 순위순으로, 그보다 오래된 매치는
+        이어지는 페이지에서 최신순으로 반환해 모든 매치에 도달할 수 있게 한다.
+        """
+        tokens = _SEARCH_TOKEN.findall(query)
+        if not tokens:
+            return []
+        match = " ".join(f'"{token}"*' for token in tokens)
+        async with self._connect() as db:
+            db.row_factory = aiosqlite.Row
+            async with db.execute(
+                """
+                SELECT files.* FROM (
+                    SELECT rowid, rank FROM files_fts
+                    WHERE files_fts MATCH ?
+                    ORDER BY rowid DESC
+                    LIMIT ?
+                ) AS hits
+                JOIN files ON files.rowid = hits.rowid
+                WHERE files.deleted_at IS NULL
+                ORDER BY hits.rank
+                LIMIT ? OFFSET ?
+                """,
+                (match, SEARCH_CANDIDATE_LIMIT, limit, offset),
+            ) as cursor:
+                rows = list(await cursor.fetchall())
+
+            if len(rows) < limit:
+                # 순위 후보 구간이 이 페이지에서 끝남: 후보가 꽉 찼다면 더 오래된 매치로 이어서 채움
+                async with db.execute(
+                    """
+                    SELECT COUNT(*), MIN(hits.rowid), COUNT(files.rowid) FROM (
+                        SELECT rowid FROM files_fts
+                        WHERE files_fts MATCH ?
+                        ORDER BY rowid DESC
+                        LIMIT ?
+                    ) AS hits
+                    LEFT JOIN files ON files.rowid = hits.rowid AND files.deleted_at IS NULL
+                    """,
+                    (match, SEARCH_CANDIDATE_LIMIT),
+                ) as cursor:
+                    candidates, boundary, ranked_count = await cursor.fetchone()
+                if candidates == SEARCH_CANDIDATE_LIMIT:
+                    async with db.execute(
+                        """
+                        SELECT files.* FROM files_fts
+                        JOIN files ON files.rowid = files_fts.rowid
+                        WHERE files_fts MATCH ? AND files_fts.rowid < ? AND files.deleted_at IS NULL
+                        ORDER BY files_fts.rowid DESC
+                        LIMIT ? OFFSET ?
+                        """,
+                        (match, boundary, limit - len(rows), max(0, offset - ranked_count)),
+                    ) as cursor:
+                        rows.extend(await cursor.fetchall())
+            return [(row["id"], self._row_to_metadata(row)) for row in rows]
+
+    async def rebuild_search_index(self) -> None:
+        async with self._connect() as db:
+            await db.execute("INSERT INTO files_fts(files_fts) VALUES ('rebuild')")
             await db.commit()
 
-    async def update_filename(self, doc_id: str, file_name: str) -> None:
-        async with await self._connect() as db:
+    @traced("db.get_stats")
+    async def get_stats(self, top: int = 20) -> Dict[str, Any]:
+        """집계 테이블만 읽어 전체/차원별 상위 top개 버킷 반환 (files 스캔 없음)"""
+        async with self._connect() as db:
+            async with db.execute(
+                "SELECT file_count, total_bytes, stored_bytes FROM file_stats WHERE dimension = 'total'"
+            ) as cursor:
+                row = await cursor.fetchone()
+            total = dict(zip(("file_count", "total_bytes", "stored_bytes"), row or (0, 0, 0)))
+            dimensions: Dict[str, List[Dict[str, Any]]] = {}
+            for dimension in _STATS_DIMENSIONS:
+                if dimension == "total":
+                    continue
+                # 만료 버킷은 시간순, 나머지는 용량 큰 순
+                order = "bucket" if dimension == "expiry_hour" else "total_bytes DESC"
+                async with db.execute(
+                    f"""
+                    SELECT bucket, file_count, total_bytes, stored_bytes FROM file_stats
+                    WHERE dimension = ? ORDER BY {order} LIMIT ?
+                    """,
+                    (dimension, top),
+                ) as cursor:
+                    dimensions[dimension] = [
+                        {"bucket": bucket, "file_count": count, "total_bytes": size, "stored_bytes": stored}
+                        for bucket, count, size, stored in await cursor.fetchall()
+                    ]
+        return {"total": total, "dimensions": dimensions}
+
+    @traced("db.sum_expiring")
+    async def sum_expiring(self, until_bucket: str) -> Tuple[int, int]:
+        """만료 시 단위 버킷이 until_bucket 이하인 파일의 (개수, 용량)"""
+        async with self._connect() as db:
+            async with db.execute(
+                """
+                SELECT COALESCE(SUM(file_count), 0), COALESCE(SUM(total_bytes), 0) FROM file_stats
+                WHERE dimension = 'expiry_hour' AND bucket <= ?
+                """,
+                (until_bucket,),
+            ) as cursor:
+                count, size = await cursor.fetchone()
+        return count, size
+
+    async def check_stats(self, repair: bool = True) -> List[Dict[str, Any]]:
+        """files 전체 재집계 결과와 file_stats를 비교해 어긋난 버킷 목록 반환, repair면 재생성"""
+        async with self._connect() as db:
+            async with db.execute(
+                f"""
+                SELECT dimension, bucket,
+                       SUM(kept_count), SUM(fresh_count),
+                       SUM(kept_total), SUM(fresh_total),
+                       SUM(kept_stored), SUM(fresh_stored)
+                FROM (
+                    SELECT dimension, bucket,
+                           file_count AS kept_count, 0 AS fresh_count,
+                           total_bytes AS kept_total, 0 AS fresh_total,
+                           stored_bytes AS kept_stored, 0 AS fresh_stored
+                    FROM file_stats
+                    UNION ALL
+                    SELECT dimension, bucket, 0, file_count, 0, total_bytes, 0, stored_bytes
+                    FROM ({self._stats_select_sql()})
+                )
+                GROUP BY dimension, bucket
+                HAVING SUM(kept_count) != SUM(fresh_count)
+                    OR SUM(kept_total) != SUM(fresh_total)
+                    OR SUM(kept_stored) != SUM(fresh_stored)
+                """
+            ) as cursor:
+                rows = await cursor.fetchall()
+            if repair:
+                await self._rebuild_stats(db)
+                await db.commit()
+        return [
+            {
+                "dimension": dimension,
+                "bucket": bucket,
+                "file_count": (kept_count, fresh_count),
+                "total_bytes": (kept_total, fresh_total),
+                "stored_bytes": (kept_stored, fresh_stored),
+            }
+            for dimension, bucket, kept_count, fresh_count, kept_total, fresh_total, kept_stored, fresh_stored in rows
+        ]
+
+    @traced("db.list_batch")
+    async def list_batch(
+        self, after_id: str = "", limit: int = 500
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """id 순으로 after_id 다음부터 limit개 조회 (점진적 순회용)"""
+        async with self._connect() as db:
+            db.row_factory = aiosqlite.Row
+            async with db.execute(
+                "SELECT * FROM files WHERE id > ? AND deleted_at IS NULL ORDER BY id LIMIT ?",
+                (after_id, limit),
+            ) as cursor:
+                rows = await cursor.fetchall()
+                return [(row["id"], self._row_to_metadata(row)) for row in rows]
+
+    @traced("db.list_pending_digests")
+    async def list_pending_digests(
+        self, after_id: str = "", limit: int = 20, max_attempts: int = 0
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """계산 대기 행 중 재시도 시각이 지났고 시도 횟수가 max_attempts 미만(0이면 무제한)인 행"""
+        async with self._connect() as db:
+            db.row_factory = aiosqlite.Row
+            async with db.execute(
+                """
+                SELECT * FROM files
+                WHERE pending_digests IS NOT NULL AND id > ? AND deleted_at IS NULL
+                  AND COALESCE(digest_retry_at, 0) <= ?
+                  AND (? <= 0 OR COALESCE(digest_attempts, 0) < ?)
+                ORDER BY id LIMIT ?
+                """,
+                (after_id, time.time(), max_attempts, max_attempts, limit),
+            ) as cursor:
+                rows = await cursor.fetchall()
+                return [(row["id"], self._row_to_metadata(row)) for row in rows]
+
+    @traced("db.update_digests")
+    async def update_digests(self, doc_id: str, digests: Dict[str, str]) -> None:
+        async with self._connect() as db:
+            cursor = await db.execute(
+                """
+                UPDATE files
+                SET md5_hash = COALESCE(?, md5_hash),
+                    sha1_hash = COALESCE(?, sha1_hash),
+                    pending_digests = NULL
+                WHERE id = ? AND deleted_at IS NULL
+                """,
+                (digests.get("md5"), digests.get("sha1"), doc_id),
+            )
+            updated = cursor.rowcount == 1
+            if updated:
+                await self._record_change(db, "update", doc_id)
+            await db.commit()
+        if updated:
+            change_notifier.notify()
+
+    @traced("db.defer_digests")
+    async def defer_digests(
+        self, doc_id: str, error: str, base_seconds: float, max_seconds: float
+    ) -> int:
+        """다이제스트 계산 실패 기록, 지수 백오프로 다음 재시도 시각을 정하고 누적 시도 횟수 반환"""
+        async with self._connect() as db:
             await db.execute(
-                "UPDATE files SET file_name = ? WHERE id = ?", (file_name, doc_id)
+                """
+                UPDATE files
+                SET digest_retry_at = ? + MIN(? * (1 << COALESCE(digest_attempts, 0)), ?),
+                    digest_attempts = COALESCE(digest_attempts, 0) + 1,
+                    digest_error = ?
+                WHERE id = ?
+                """,
+                (time.time(), base_seconds, max_seconds, error, doc_id),
             )
+            async with db.execute(
+                "SELECT COALESCE(digest_attempts, 0) FROM files WHERE id = ?", (doc_id,)
+            ) as cursor:
+                row = await cursor.fetchone()
             await db.commit()
+        return row[0] if row else 0
+
+    @traced("db.get_state")
+    async def get_state(self, key: str) -> Optional[str]:
+        async with self._connect() as db:
+            async with db.execute(
+                "SELECT value FROM maintenance_state WHERE key = ?", (key,)
+            ) as cursor:
+                row = await cursor.fetchone()
+                return row[0] if row else None
+
+    @traced("db.set_state")
+    async def set_state(self, key: str, value: str) -> None:
+        async with self._connect() as db:
+            await db.execute(
+                "INSERT OR REPLACE INTO maintenance_state (key, value) VALUES (?, ?)",
+                (key, value),
+            )
+            await db.commit()
+
+    @traced("db.delete")
+    async def delete(self, doc_id: str, reason: str = "delete") -> None:
+        await self.delete_many([doc_id], reason)
+
+    @traced("db.delete_many")
+    async def delete_many(self, doc_ids: List[str], reason: str = "delete") -> int:
+        """삭제 표시(tombstone)만 남겨 즉시 조회 대상에서 제외, 스토리지 삭제는 리퍼가 수행
+
+        reason(delete/expire)은 변경 로그 연산으로 기록한다.
+        """
+        now = datetime.datetime.utcnow().isoformat() + "Z"
+        marked = 0
+        async with self._connect() as db:
+            for doc_id in doc_ids:
+                async with db.execute(
+                    "SELECT file_hash FROM files WHERE id = ? AND deleted_at IS NULL", (doc_id,)
+                ) as cursor:
+                    row = await cursor.fetchone()
+                if row is None:
+                    continue
+                await db.execute(
+                    """
+                    UPDATE files
+                    SET deleted_at = ?, delete_attempts = 0, delete_retry_at = 0, delete_error = NULL
+                    WHERE id = ?
+                    """,
+                    (now, doc_id),
+                )
+                await self._record_change(db, reason, doc_id, row[0])
+                marked += 1
+            await db.commit()
+        if marked:
+            change_notifier.notify()
+        return marked
+
+    @traced("db.list_tombstones")
+    async def list_tombstones(self, limit: int, ids: Optional[List[str]] = None) -> List[Tuple[str, str, int]]:
+        """재시도 시각이 지난 삭제 표시 행의 (id, file_hash, 시도 횟수), ids를 주면 그 중 아직 표시된 행만"""
+        async with self._connect() as db:
+            if ids is None:
+                query = """
+                    SELECT id, file_hash, delete_attempts FROM files
+                    WHERE deleted_at IS NOT NULL AND delete_retry_at <= ?
+                    ORDER BY delete_retry_at LIMIT ?
+                """
+                params: Tuple[Any, ...] = (time.time(), limit)
+            else:
+                query = f"""
+                    SELECT id, file_hash, delete_attempts FROM files
+                    WHERE deleted_at IS NOT NULL AND id IN ({",".join("?" * len(ids))})
+                    LIMIT ?
+                """
+                params = (*ids, limit)
+            async with db.execute(query, params) as cursor:
+                return [tuple(row) for row in await cursor.fetchall()]
+
+    @traced("db.purge_tombstones")
+    async def purge_tombstones(self, doc_ids: List[str]) -> int:
+        """스토리지 삭제가 끝난 삭제 표시 행 제거"""
+        if not doc_ids:
+            return 0
+        async with self._connect() as db:
+            cursor = await db.execute(
+                f"DELETE FROM files WHERE deleted_at IS NOT NULL AND id IN ({','.join('?' * len(doc_ids))})",
+                doc_ids,
+            )
+            await db.commit()
+            return cursor.rowcount
+
+    @traced("db.defer_tombstones")
+    async def defer_tombstones(self, failures: Dict[str, Tuple[float, str]]) -> None:
+        """삭제 실패 행의 시도 횟수, 다음 재시도 시각(epoch), 오류 기록"""
+        if not failures:
+            return
+        async with self._connect() as db:
+            await db.executemany(
+                """
+                UPDATE files
+                SET delete_attempts = delete_attempts + 1, delete_retry_at = ?, delete_error = ?
+                WHERE id = ? AND deleted_at IS NOT NULL
+                """,
+                [(retry_at, error, doc_id) for doc_id, (retry_at, error) in failures.items()],
+            )
+            await db.commit()
+
+    @traced("db.tombstone_stats")
+    async def tombstone_stats(self) -> Dict[str, Any]:
+        async with self._connect() as db:
+            async with db.execute(
+                """
+                SELECT COUNT(*), MIN(deleted_at),
+                       COALESCE(SUM(delete_attempts > 0), 0), COALESCE(MAX(delete_attempts), 0)
+                FROM files WHERE deleted_at IS NOT NULL
+                """
+            ) as cursor:
+                backlog, oldest, failing, max_attempts = await cursor.fetchone()
+            async with db.execute(
+                """
+                SELECT file_hash, delete_attempts, delete_error FROM files
+                WHERE deleted_at IS NOT NULL AND delete_error IS NOT NULL
+                ORDER BY delete_attempts DESC LIMIT 10
+                """
+            ) as cursor:
+                errors = [
+                    {"file_hash": file_hash, "attempts": attempts, "error": error}
+                    for file_hash, attempts, error in await cursor.fetchall()
+                ]
+        return {
+            "backlog": backlog,
+            "oldest_deleted_at": oldest,
+            "failing": failing,
+            "max_attempts": max_attempts,
+            "errors": errors,
+        }
+
+    @traced("db.update_filename")
+    async def update_filename(self, doc_id: str, file_name: str) -> None:
+        async with self._connect() as db:
+            cursor = await db.execute(
+                "UPDATE files SET file_name = ? WHERE id = ? AND deleted_at IS NULL", (file_name, doc_id)
+            )
+            updated = cursor.rowcount == 1
+            if updated:
+                await self._record_change(db, "rename", doc_id)
+            await db.commit()
+        if updated:
+            change_notifier.notify()
+
+    @traced("db.list_changes")
+    async def list_changes(self, since: int, limit: int = 500) -> List[Dict[str, Any]]:
+        async with self._connect() as db:
+            async with db.execute(
+                """
+                SELECT seq, op, file_hash, payload, created_at FROM file_changes
+                WHERE seq > ? ORDER BY seq LIMIT ?
+                """,
+                (since, limit),
+            ) as cursor:
+                rows = await cursor.fetchall()
+        return [
+            {
+                "seq": seq,
+                "op": op,
+                "file_hash": file_hash,
+                "file": json.loads(payload) if payload else None,
+                "time": created_at,
+            }
+            for seq, op, file_hash, payload, created_at in rows
+        ]
+
+    @traced("db.get_change_bounds")
+    async def get_change_bounds(self) -> Tuple[int, int]:
+        """변경 로그에 남아있는 (최소 seq, 최대 seq), 비어있으면 마지막 발급 seq 기준"""
+        async with self._connect() as db:
+            async with db.execute("SELECT MIN(seq), MAX(seq) FROM file_changes") as cursor:
+                min_seq, max_seq = await cursor.fetchone()
+            if max_seq is None:
+                async with db.execute(
+                    "SELECT seq FROM sqlite_sequence WHERE name = 'file_changes'"
+                ) as cursor:
+                    row = await cursor.fetchone()
+                last_seq = row[0] if row else 0
+                return last_seq + 1, last_seq
+            return min_seq, max_seq
+
+    @traced("db.prune_changes")
+    async def prune_changes(self, keep: int) -> int:
+        async with self._connect() as db:
+            cursor = await db.execute(
+                "DELETE FROM file_changes WHERE seq <= (SELECT MAX(seq) FROM file_changes) - ?",
+                (keep,),
+            )
+            await db.commit()
+            return cursor.rowcount
+
+    async def _record_change(
+        self, db, op: str, doc_id: str, file_hash: Optional[str] = None
+    ) -> None:
+        payload = None
+        if op not in _REMOVAL_OPS:
+            db.row_factory = aiosqlite.Row
+            # 삭제 표시된 행의 변경은 기록하지 않음 (삭제 후 다시 나타나는 것 방지)
+            async with db.execute(
+                "SELECT * FROM files WHERE id = ? AND deleted_at IS NULL", (doc_id,)
+            ) as cursor:
+                row = await cursor.fetchone()
+            if row is None:
+                return
+            file_hash = row["file_hash"]
+            payload = json.dumps(self._row_to_metadata(row))
+        await db.execute(
+            """
+            INSERT INTO file_changes (op, doc_id, file_hash, payload, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (op, doc_id, file_hash, payload, datetime.datetime.utcnow().isoformat() + "Z"),
+        )
 
     def _row_to_metadata(self, row) -> Dict[str, Any]:
         return {
@@ -108,6 +810,9 @@ class FileMetadataDB:
             "expire_time": row["expire_time"],
             "expire_minutes": row["expire_minutes"],
             "uploader_ip": row["uploader_ip"],
+            "content_encoding": row["content_encoding"],
+            "stored_size": row["stored_size"],
+            "pending_digests": row["pending_digests"].split(",") if row["pending_digests"] else [],
             "hash": {
                 "sha256": row["file_hash"],
                 "md5": row["md5_hash"],
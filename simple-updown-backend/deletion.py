@@ -0,0 +1,131 @@
+import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Iterable, List, Set, Tuple
+from starlette.concurrency import run_in_threadpool
+from dependencies import THUMBNAIL_DIR, db, storage
+
+# 한 번에 처리할 삭제 표시 수 (R2 DeleteObjects 최대 키 수와 동일)
+REAPER_BATCH_SIZE = int(os.getenv("REAPER_BATCH_SIZE", "1000"))
+REAPER_INTERVAL_SECONDS = float(os.getenv("REAPER_INTERVAL_SECONDS", "5"))
+REAPER_RETRY_BASE_SECONDS = 10
+REAPER_RETRY_MAX_SECONDS = 3600
+
+
+class DeletionGate:
+    """같은 해시에 대한 업로드끼리, 그리고 업로드와 리퍼의 스토리지 삭제가 겹치지 않도록 조율
+
+    업로드는 같은 해시의 다른 업로드나 삭제가 진행 중이면 끝날 때까지 기다리고,
+    리퍼는 업로드 중인 해시를 이번 배치에서 건너뛴다.
+    """
+
+    def __init__(self) -> None:
+        self._reaping: Set[str] = set()
+        self._uploading: Set[str] = set()
+        self._released = asyncio.Condition()
+
+    @asynccontextmanager
+    async def uploading(self, file_hash: str):
+        async with self._released:
+            await self._released.wait_for(
+                lambda: file_hash not in self._reaping and file_hash not in self._uploading
+            )
+            self._uploading.add(file_hash)
+        try:
+            yield
+        finally:
+            async with self._released:
+                self._uploading.discard(file_hash)
+                self._released.notify_all()
+
+    def claim(self, file_hashes: Iterable[str]) -> Set[str]:
+        claimed = {file_hash for file_hash in file_hashes if file_hash not in self._uploading}
+        self._reaping |= claimed
+        return claimed
+
+    async def release(self, file_hashes: Set[str]) -> None:
+        async with self._released:
+            self._reaping -= file_hashes
+            self._released.notify_all()
+
+
+deletion_gate = DeletionGate()
+
+
+def _remove_thumbnails(file_hashes: Set[str]) -> int:
+    """캐시된 썸네일({hash}_{w}x{h}) 중 삭제된 해시의 것을 디렉터리 1회 순회로 제거"""
+    removed = 0
+    try:
+        entries = list(os.scandir(THUMBNAIL_DIR))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if entry.name.split("_", 1)[0] in file_hashes:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except OSError as e:
+                print(f"썸네일 삭제 실패 ({entry.name}): {str(e)}")
+    return removed
+
+
+async def _reap_batch(batch: List[Tuple[str, str, int]]) -> Tuple[int, int]:
+    """한 배치의 스토리지 객체와 썸네일을 삭제하고 (완료 수, 실패 수) 반환"""
+    claimed = deletion_gate.claim(file_hash for _, file_hash, _ in batch)
+    try:
+        # 점유 전에 재업로드로 대체된 행은 제외
+        batch = await db.list_tombstones(len(batch), [doc_id for doc_id, _, _ in batch])
+        batch = [item for item in batch if item[1] in claimed]
+        if not batch:
+            return 0, 0
+        file_hashes = list({file_hash for _, file_hash, _ in batch})
+        try:
+            errors = await run_in_threadpool(storage.delete_files, file_hashes)
+        except Exception as e:
+            errors = {file_hash: str(e) for file_hash in file_hashes}
+
+        done_ids = [doc_id for doc_id, file_hash, _ in batch if file_hash not in errors]
+        now = time.time()
+        failures = {
+            doc_id: (
+                now + min(REAPER_RETRY_BASE_SECONDS * 2 ** attempts, REAPER_RETRY_MAX_SECONDS),
+                errors[file_hash],
+            )
+            for doc_id, file_hash, attempts in batch
+            if file_hash in errors
+        }
+        deleted_hashes = {file_hash for file_hash in file_hashes if file_hash not in errors}
+        if deleted_hashes:
+            try:
+                await run_in_threadpool(_remove_thumbnails, deleted_hashes)
+            except Exception as e:
+                # 썸네일은 캐시일 뿐이므로 정리 실패가 메타데이터 제거를 막지 않도록 함
+                print(f"썸네일 정리 오류: {str(e)}")
+        await db.purge_tombstones(done_ids)
+        await db.defer_tombstones(failures)
+        return len(done_ids), len(failures)
+    finally:
+        await deletion_gate.release(claimed)
+
+
+async def reap_tombstones() -> None:
+    """삭제 표시된 파일을 배치 단위로 스토리지에서 지우고 메타데이터 행 제거, 실패는 지수 백오프로 재시도"""
+    deleted_count = 0
+    failed_count = 0
+    while True:
+        batch = await db.list_tombstones(REAPER_BATCH_SIZE)
+        if not batch:
+            break
+        done, failed = await _reap_batch(batch)
+        deleted_count += done
+        failed_count += failed
+        if done + failed == 0:
+            # 전부 업로드 중인 해시: 다음 주기에 다시 시도
+            break
+
+    if deleted_count or failed_count:
+        print(f"삭제 처리 완료: {deleted_count}개 삭제, {failed_count}개 재시도 예정")
+    # 청크 저장소는 참조가 사라진 청크를 회수
+    if deleted_count and hasattr(storage, "collect_garbage"):
+        await run_in_threadpool(storage.collect_garbage)
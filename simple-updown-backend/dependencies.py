@@ -1,12 +1,72 @@
 import os
+import inspect
+import functools
+import threading
 from database import FileMetadataDB
-from local_storage import LocalStorage
-from r2_storage import R2Storage
+from tracing import span, traced_iter
 
 storage_type = os.getenv("STORAGE_TYPE", "local")
-if storage_type == "local":
-    storage = LocalStorage()
-else:
-    storage = R2Storage()
+# 썸네일 캐시 위치 (저장소 백엔드와 무관하게 로컬 디스크 사용)
+THUMBNAIL_DIR = os.getenv(
+    "THUMBNAIL_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "thumbnails"),
+)
+
+
+def _create_storage():
+    # boto3 등 백엔드 의존성은 실제 사용하는 백엔드만, 처음 사용할 때 import
+    if storage_type == "local":
+        from local_storage import LocalStorage
+        return LocalStorage()
+    if storage_type == "chunk":
+        from chunk_storage import ChunkStorage
+        return ChunkStorage()
+    from r2_storage import R2Storage
+    if os.getenv("R2_WRITE_BEHIND", "").lower() in ("1", "true", "yes"):
+        from local_storage import LocalStorage
+        from write_behind_storage import WriteBehindStorage
+        return WriteBehindStorage(LocalStorage(), R2Storage())
+    return R2Storage()
+
+
+class LazyStorage:
+    """첫 속성 접근 시 실제 스토리지 백엔드를 생성하는 프록시
+
+    스레드풀(지연 기동 작업)과 이벤트 루프(요청)에서 동시에 접근해도 백엔드는 한 번만 생성한다.
+    """
+
+    def __init__(self, factory) -> None:
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+
+    def load(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.load(), name)
+        if not callable(attr):
+            return attr
+
+        # 스토리지 호출을 요청 추적 span(storage.<메서드>)으로 기록
+        @functools.wraps(attr)
+        def traced_call(*args, **kwargs):
+            with span(f"storage.{name}"):
+                result = attr(*args, **kwargs)
+            if inspect.isgenerator(result):
+                return traced_iter(f"storage.{name}", result)
+            return result
+        return traced_call
+
+
+storage = LazyStorage(_create_storage)
 
 db = FileMetadataDB()
@@ -0,0 +1,74 @@
+import os
+import hashlib
+from typing import Dict, Iterable, List, Optional
+from starlette.concurrency import run_in_threadpool
+from compression import decompress_stream
+from dependencies import db, storage
+
+# 저장 키로 쓰이는 주 해시, 업로드 시 항상 계산
+ADDRESS_DIGEST = "sha256"
+SECONDARY_DIGESTS = ("md5", "sha1")
+
+# inline: 업로드 중 함께 계산 / deferred: 백그라운드에서 나중에 계산 / off: 계산 안 함
+DIGEST_POLICY = os.getenv("DIGEST_POLICY", "deferred").lower()
+DIGEST_BATCH_SIZE = 20
+# 읽기 실패/크기 불일치 행의 재시도 (지수 백오프, DIGEST_MAX_ATTEMPTS회 후 포기)
+DIGEST_MAX_ATTEMPTS = int(os.getenv("DIGEST_MAX_ATTEMPTS", "5"))
+DIGEST_RETRY_BASE_SECONDS = 60
+DIGEST_RETRY_MAX_SECONDS = 6 * 3600
+
+
+def inline_digests() -> List[str]:
+    if DIGEST_POLICY == "inline":
+        return [ADDRESS_DIGEST, *SECONDARY_DIGESTS]
+    return [ADDRESS_DIGEST]
+
+
+def pending_digests() -> List[str]:
+    """업로드 직후 백그라운드 계산 대기 상태로 남길 다이제스트 목록"""
+    if DIGEST_POLICY == "deferred":
+        return list(SECONDARY_DIGESTS)
+    return []
+
+
+def compute_digests(chunks: Iterable[bytes], names: Iterable[str], expected_size: Optional[int] = None) -> Dict[str, str]:
+    hashers = {name: hashlib.new(name) for name in names}
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+        for hasher in hashers.values():
+            hasher.update(chunk)
+    if expected_size is not None and size != expected_size:
+        raise ValueError(f"size mismatch: expected {expected_size}, read {size}")
+    return {name: hasher.hexdigest() for name, hasher in hashers.items()}
+
+
+async def fill_pending_digests() -> None:
+    """저장된 원본 내용으로 대기 중인 보조 다이제스트를 계산해 DB에 채움"""
+    filled_count = 0
+    after_id = ""
+    while True:
+        batch = await db.list_pending_digests(after_id, DIGEST_BATCH_SIZE, DIGEST_MAX_ATTEMPTS)
+        if not batch:
+            break
+        for doc_id, metadata in batch:
+            file_hash = metadata["hash"]["sha256"]
+            try:
+                chunks = decompress_stream(storage.stream_file(file_hash), metadata.get("content_encoding"))
+                digests = await run_in_threadpool(
+                    compute_digests, chunks, metadata["pending_digests"], metadata.get("file_size")
+                )
+            except Exception as e:
+                attempts = await db.defer_digests(
+                    doc_id, str(e), DIGEST_RETRY_BASE_SECONDS, DIGEST_RETRY_MAX_SECONDS
+                )
+                if DIGEST_MAX_ATTEMPTS > 0 and attempts >= DIGEST_MAX_ATTEMPTS:
+                    print(f"다이제스트 계산 포기 ({file_hash}, {attempts}회 실패): {str(e)}")
+                else:
+                    print(f"다이제스트 계산 실패 ({file_hash}, {attempts}회째): {str(e)}")
+                continue
+            await db.update_digests(doc_id, digests)
+            filled_count += 1
+        after_id = batch[-1][0]
+    if filled_count:
+        print(f"보조 다이제스트 계산 완료: {filled_count}개 파일")
@@ -0,0 +1,39 @@
+import time
+from typing import Any, Dict
+
+# app 모듈 import 직후 기록되어 프로세스 기동 시간 측정의 기준이 됨
+PROCESS_START = time.monotonic()
+
+state: Dict[str, Any] = {
+    "ready": False,
+    "ready_after": None,
+    "first_request_after": None,
+    "reconcile_running": False,
+}
+
+
+def _elapsed() -> float:
+    return round(time.monotonic() - PROCESS_START, 3)
+
+
+def mark_ready() -> None:
+    state["ready"] = True
+    state["ready_after"] = _elapsed()
+    print(f"서비스 준비 완료: 기동 후 {state['ready_after']}초")
+
+
+def mark_not_ready() -> None:
+    state["ready"] = False
+
+
+class FirstRequestTimerMiddleware:
+    """첫 HTTP 요청 완료까지 걸린 시간(time-to-first-request) 기록"""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.app(scope, receive, send)
+        if scope["type"] == "http" and state["first_request_after"] is None:
+            state["first_request_after"] = _elapsed()
+            print(f"첫 요청 처리 완료: 기동 후 {state['first_request_after']}초")
@@ -2,13 +2,16 @@ import os
 import shutil
 import tempfile
 import time
-from typing import Optional, Generator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Generator
 from utils import format_file_size
 
 _DEFAULT_UPLOAD_DIR = os.getenv(
     "UPLOAD_DIR",
     os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads")
 )
+# 일괄 삭제 시 병렬 unlink 스레드 수
+_DELETE_WORKERS = int(os.getenv("DELETE_WORKERS", "8"))
 
 
 class LocalStorage:
@@ -147,6 +150,21 @@ class LocalStorage:
             return True
         return False
 
+    def _unlink(self, file_name: str) -> Optional[str]:
+        try:
+            os.remove(os.path.join(self.upload_dir, file_name))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            return str(e)
+        return None
+
+    def delete_files(self, file_names: List[str]) -> Dict[str, str]:
+        """여러 파일을 병렬로 삭제, 실패한 파일명과 오류 반환 (없는 파일은 성공으로 간주)"""
+        with ThreadPoolExecutor(max_workers=max(1, min(_DELETE_WORKERS, len(file_names)))) as pool:
+            errors = pool.map(self._unlink, file_names)
+            return {name: error for name, error in zip(file_names, errors) if error}
+
     def get_file_url(self, file_name: str) -> str:
         return f"/files/{file_name}"
 
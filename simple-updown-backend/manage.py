@@ -0,0 +1,47 @@
+"""운영 관리 명령
+
+사용법:
+    python manage.py search-rebuild [db_path]   파일명 검색 인덱스(FTS5)를 files 테이블에서 다시 생성 (VACUUM 등 이후 복구용)
+    python manage.py stats-rebuild [db_path]    집계 통계(file_stats)를 files 테이블과 대조 후 다시 생성
+"""
+import argparse
+import asyncio
+import time
+from database import DB_PATH, FileMetadataDB
+
+
+async def search_rebuild(db_path: str) -> None:
+    db = FileMetadataDB(db_path)
+    await db.init()
+    start = time.monotonic()
+    await db.rebuild_search_index()
+    print(f"검색 인덱스 재생성 완료: {time.monotonic() - start:.1f}초")
+
+
+async def stats_rebuild(db_path: str) -> None:
+    db = FileMetadataDB(db_path)
+    await db.init()
+    start = time.monotonic()
+    drift = await db.check_stats(repair=True)
+    for entry in drift:
+        print(
+            f"불일치 {entry['dimension']}/{entry['bucket'] or '-'}: "
+            f"파일 수 {entry['file_count'][0]} -> {entry['file_count'][1]}, "
+            f"용량 {entry['total_bytes'][0]} -> {entry['total_bytes'][1]}, "
+            f"저장 용량 {entry['stored_bytes'][0]} -> {entry['stored_bytes'][1]}"
+        )
+    print(f"집계 통계 재생성 완료: 불일치 {len(drift)}건, {time.monotonic() - start:.1f}초")
+
+
+COMMANDS = {
+    "search-rebuild": search_rebuild,
+    "stats-rebuild": stats_rebuild,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simple-Updown 관리 명령")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument("db_path", nargs="?", default=DB_PATH)
+    args = parser.parse_args()
+    asyncio.run(COMMANDS[args.command](args.db_path))
@@ -1,8 +1,11 @@
 import os
-from typing import Optional
+from typing import Dict, List, Optional
 import boto3
 from botocore.exceptions import ClientError
 
+# DeleteObjects 한 번에 보낼 수 있는 최대 키 수
+DELETE_OBJECTS_MAX_KEYS = 1000
+
 
 class R2Storage:
     def __init__(self) -> None:
@@ -46,6 +49,16 @@ class R2Storage:
             print(f"Error getting file stream: {e}")
             return None
 
+    def stream_file(self, object_name: str, chunk_size: int = 1024 * 1024):
+        stream = self.get_file_stream(object_name)
+        if stream is None:
+            return
+        try:
+            for chunk in stream.iter_chunks(chunk_size):
+                yield chunk
+        finally:
+            stream.close()
+
     def delete_file(self, object_name: str) -> bool:
         try:
             self.s3_client.delete_object(Bucket=self.bucket_name, Key=object_name)
@@ -54,6 +67,24 @@ class R2Storage:
             print(f"Error deleting file: {e}")
             return False
 
+    def delete_files(self, object_names: List[str]) -> Dict[str, str]:
+        """DeleteObjects로 최대 1000개씩 일괄 삭제, 실패한 키와 오류 반환"""
+        failures: Dict[str, str] = {}
+        for start in range(0, len(object_names), DELETE_OBJECTS_MAX_KEYS):
+            batch = object_names[start:start + DELETE_OBJECTS_MAX_KEYS]
+            try:
+                response = self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": name} for name in batch], "Quiet": True},
+                )
+            except ClientError as e:
+                print(f"Error deleting files: {e}")
+                failures.update((name, str(e)) for name in batch)
+                continue
+            for error in response.get("Errors", []):
+                failures[error["Key"]] = f"{error.get('Code')}: {error.get('Message')}"
+        return failures
+
     def get_file_bytes(self, object_name: str) -> Optional[bytes]:
         try:
             response = self.s3_client.get_object(Bucket=self.bucket_name, Key=object_name)
@@ -0,0 +1,40 @@
+import os
+import hmac
+import threading
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from profiler import sample_stacks, to_collapsed
+
+router = APIRouter()
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_MAX_SECONDS = 60
+
+_profile_lock = threading.Lock()
+
+
+def require_admin(token: str) -> None:
+    # ADMIN_TOKEN 미설정 시 관리자 엔드포인트 자체를 노출하지 않음
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@router.post("/api/admin/profile")
+async def profile(
+    seconds: float = 10,
+    interval_ms: float = 5,
+    x_admin_token: str = Header(default=""),
+):
+    require_admin(x_admin_token)
+    if seconds <= 0 or seconds > PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {PROFILE_MAX_SECONDS}")
+    if not _profile_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Profiler already running")
+    try:
+        counts = await run_in_threadpool(sample_stacks, seconds, max(interval_ms, 1) / 1000)
+    finally:
+        _profile_lock.release()
+    return PlainTextResponse(to_collapsed(counts))
@@ -1,28 +1,45 @@
-import os
+import asyncio
 import datetime
+import zipfile
+from typing import List, Optional
 from urllib.parse import quote
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
-from dependencies import db, storage, storage_type
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from archive import stream_zip, unique_entry_name
+from compression import accepts_encoding, decompress_stream, is_precompressed
+from dependencies import db, storage
 
 router = APIRouter()
 
+ARCHIVE_MAX_FILES = 1000
+
+
+class ArchiveRequest(BaseModel):
+    hashes: List[str]
+    name: Optional[str] = None
+
+
+def _parse_time(time_str: Optional[str]) -> Optional[datetime.datetime]:
+    if not time_str:
+        return None
+    if time_str.endswith('Z'):
+        time_str = time_str[:-1]
+    return datetime.datetime.fromisoformat(time_str)
+
 
 @router.get("/download/{file_hash}")
-async def download_file(file_hash: str):
+async def download_file(file_hash: str, request: Request):
     result = await db.get_by_hash(file_hash)
     if result is None:
         raise HTTPException(status_code=404, detail="File not found")
     doc_id, file_metadata = result
 
-    expire_time_str = file_metadata.get("expire_time")
     try:
-        if expire_time_str.endswith('Z'):
-            expire_time_str = expire_time_str[:-1]
-        expire_time = datetime.datetime.fromisoformat(expire_time_str)
+        expire_time = _parse_time(file_metadata.get("expire_time"))
         if datetime.datetime.utcnow() > expire_time:
-            storage.delete_file(file_hash)
-            await db.delete(doc_id)
+            await db.delete(doc_id, reason="expire")
             raise HTTPException(status_code=404, detail="File expired and deleted")
     except HTTPException:
         raise
@@ -37,23 +54,80 @@ async def download_file(file_hash: str):
     filename = file_metadata.get("file_name", "unknown")
     encoded_filename = quote(filename, safe='')
 
-    def file_streamer():
-        if storage_type == "local":
-            file_path = os.path.join(storage.upload_dir, file_hash)
-            with open(file_path, 'rb') as f:
-                while chunk := f.read(1024 * 1024):
-                    yield chunk
+    headers = {
+        "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}",
+        "Cache-Control": "no-cache",
+    }
+
+    # 압축 저장된 파일은 클라이언트가 지원하면 그대로 전달, 아니면 스트리밍 해제
+    content_encoding = file_metadata.get("content_encoding")
+    chunks = storage.stream_file(file_hash)
+    if content_encoding:
+        headers["Vary"] = "Accept-Encoding"
+        if accepts_encoding(request.headers.get("accept-encoding"), content_encoding):
+            headers["Content-Encoding"] = content_encoding
         else:
-            stream = storage.get_file_stream(file_hash)
-            if stream:
-                for chunk in stream:
-                    yield chunk
+            chunks = decompress_stream(chunks, content_encoding)
+
+    return StreamingResponse(chunks, media_type=content_type, headers=headers)
+
+
+@router.post("/download/archive")
+async def download_archive(body: ArchiveRequest):
+    hashes = list(dict.fromkeys(body.hashes))
+    if not hashes:
+        raise HTTPException(status_code=400, detail="No files requested")
+    if len(hashes) > ARCHIVE_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files (max {ARCHIVE_MAX_FILES})")
+
+    now = datetime.datetime.utcnow()
+    entries = []
+    missing = []
+    used_names = set()
+    found = await db.get_by_hashes(hashes)
+    # 메타데이터만 있고 객체가 없으면 0바이트 엔트리가 되므로 응답 전에 확인
+    exists = await asyncio.gather(*(run_in_threadpool(storage.file_exists, h) for h in found))
+    stored = {h for h, ok in zip(found, exists) if ok}
+    for file_hash in hashes:
+        result = found.get(file_hash)
+        if result is None or file_hash not in stored:
+            missing.append(file_hash)
+            continue
+        _, file_metadata = result
+        try:
+            expire_time = _parse_time(file_metadata.get("expire_time"))
+            upload_time = _parse_time(file_metadata.get("upload_time")) or now
+        except (ValueError, TypeError):
+            missing.append(file_hash)
+            continue
+        if expire_time is None or now > expire_time:
+            missing.append(file_hash)
+            continue
+
+        file_name = file_metadata.get("file_name") or file_hash
+        content_type = file_metadata.get("content_type")
+        content_encoding = file_metadata.get("content_encoding")
+        entries.append({
+            "name": unique_entry_name(file_name, used_names),
+            "date_time": max(upload_time, datetime.datetime(1980, 1, 1)).timetuple()[:6],
+            "compress_type": zipfile.ZIP_STORED if is_precompressed(content_type, file_name) else zipfile.ZIP_DEFLATED,
+            "size": file_metadata.get("file_size"),
+            "open": lambda h=file_hash, e=content_encoding: decompress_stream(storage.stream_file(h), e),
+        })
+
+    if missing:
+        raise HTTPException(status_code=404, detail={"message": "Files not found", "hashes": missing})
+
+    archive_name = body.name or f"files-{now.strftime('%Y%m%d-%H%M%S')}.zip"
+    if not archive_name.lower().endswith(".zip"):
+        archive_name += ".zip"
+    encoded_name = quote(archive_name, safe='')
 
     return StreamingResponse(
-        file_streamer(),
-        media_type=content_type,
+        stream_zip(entries),
+        media_type="application/zip",
         headers={
-            "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}",
+            "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_name}",
             "Cache-Control": "no-cache",
         },
     )
@@ -1,12 +1,23 @@
-from fastapi import APIRouter, HTTPException
+import json
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from change_feed import change_notifier
 from dependencies import db, storage
 from utils import format_file_size
 
 router = APIRouter()
 
+CHANGE_PAGE_SIZE = 500
+SEARCH_MAX_LIMIT = 100
+SSE_KEEPALIVE_SECONDS = 15
+SSE_RETRY_MS = 5000
+
 
 @router.get("/api/files/")
 async def list_files():
+    # 목록보다 먼저 커서를 읽어, 그 사이의 변경은 델타 조회에서 다시 받도록 함
+    _, cursor = await db.get_change_bounds()
     files = []
     for doc_id, metadata in (await db.list_all()).items():
         file_hash = metadata.get("hash", {}).get("sha256")
@@ -17,7 +28,67 @@ async def list_files():
         if not metadata.get("file_size") or not metadata.get("file_name"):
             continue
         files.append(metadata)
-    return {"files": files}
+    return {"files": files, "cursor": cursor}
+
+
+@router.get("/api/files/search")
+async def search_files(q: str, limit: int = 20, offset: int = 0):
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Search query is empty")
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    offset = max(0, offset)
+    # 다음 페이지 존재 여부 확인을 위해 1개 더 조회
+    results = await db.search(q, limit + 1, offset)
+    return {
+        "files": [metadata for _, metadata in results[:limit]],
+        "limit": limit,
+        "offset": offset,
+        "has_more": len(results) > limit,
+    }
+
+
+@router.get("/api/files/changes")
+async def list_changes(since: int = 0, limit: int = CHANGE_PAGE_SIZE):
+    limit = max(1, min(limit, CHANGE_PAGE_SIZE))
+    min_seq, max_seq = await db.get_change_bounds()
+    if since < min_seq - 1 or since > max_seq:
+        # 커서가 보존 범위를 벗어남: 클라이언트는 전체 목록을 다시 불러와야 함
+        return {"changes": [], "cursor": max_seq, "reset": True, "has_more": False}
+    changes = await db.list_changes(since, limit)
+    cursor = changes[-1]["seq"] if changes else since
+    return {"changes": changes, "cursor": cursor, "reset": False, "has_more": len(changes) == limit}
+
+
+@router.get("/api/files/events")
+async def file_events(request: Request, since: Optional[int] = None):
+    last_event_id = request.headers.get("last-event-id", "")
+    cursor = int(last_event_id) if last_event_id.isdigit() else since
+    if cursor is None:
+        _, cursor = await db.get_change_bounds()
+
+    async def event_stream():
+        nonlocal cursor
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        while not await request.is_disconnected():
+            waiter = change_notifier.listen()
+            min_seq, max_seq = await db.get_change_bounds()
+            if cursor < min_seq - 1 or cursor > max_seq:
+                cursor = max_seq
+                yield f"event: reset\ndata: {json.dumps({'cursor': cursor})}\n\n"
+                continue
+            changes = await db.list_changes(cursor, CHANGE_PAGE_SIZE)
+            for change in changes:
+                cursor = change["seq"]
+                yield f"id: {cursor}\nevent: change\ndata: {json.dumps(change)}\n\n"
+            if len(changes) < CHANGE_PAGE_SIZE:
+                if not await change_notifier.wait(waiter, SSE_KEEPALIVE_SECONDS):
+                    yield ": keepalive\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.delete("/files/{file_hash}")
@@ -27,8 +98,6 @@ async def delete_file(file_hash: str):
         raise HTTPException(status_code=404, detail="File not found")
     doc_id, _ = result
 
-    if not storage.delete_file(file_hash):
-        raise HTTPException(status_code=500, detail="Failed to delete file from storage")
-
+    # 삭제 표시만 하고 즉시 응답, 스토리지 객체와 썸네일은 리퍼가 일괄 삭제
     await db.delete(doc_id)
     return {"message": "File deleted successfully"}
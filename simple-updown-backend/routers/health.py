@@ -0,0 +1,25 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from dependencies import storage
+from lifecycle import state
+
+router = APIRouter()
+
+
+@router.get("/healthz")
+async def liveness():
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+async def readiness():
+    body = {
+        "ready": state["ready"],
+        "storage_loaded": storage.loaded,
+        "ready_after": state["ready_after"],
+        "first_request_after": state["first_request_after"],
+        "reconcile_running": state["reconcile_running"],
+    }
+    if not state["ready"]:
+        return JSONResponse(status_code=503, content=body)
+    return body
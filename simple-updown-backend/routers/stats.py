@@ -0,0 +1,41 @@
+import datetime
+from fastapi import APIRouter, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
+from dependencies import db, storage
+
+router = APIRouter()
+
+
+@router.get("/api/stats")
+async def file_stats(top: int = Query(20, ge=1, le=200)):
+    """트리거로 유지되는 집계 테이블에서 전체/콘텐츠 타입/업로더 대역/만료 시간대별 통계 반환"""
+    stats = await db.get_stats(top)
+    # 만료 버킷은 시 단위이므로 '1시간 이내'는 다음 시 버킷이 끝나는 시각까지로 근사
+    until = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+    count, size = await db.sum_expiring(until.strftime("%Y-%m-%dT%H"))
+    stats["expiring_within_hour"] = {
+        "file_count": count,
+        "total_bytes": size,
+        "until": until.strftime("%Y-%m-%dT%H:59:59Z"),
+    }
+    return stats
+
+
+@router.get("/api/stats/deletion")
+async def deletion_stats():
+    """리퍼가 아직 처리하지 않은 삭제 표시 수와 재시도 중인 항목"""
+    return await db.tombstone_stats()
+
+
+@router.get("/api/stats/dedup")
+async def dedup_stats():
+    if not hasattr(storage, "dedup_stats"):
+        raise HTTPException(status_code=404, detail="Chunk deduplication is not enabled")
+    return await run_in_threadpool(storage.dedup_stats)
+
+
+@router.get("/api/stats/replication")
+async def replication_stats():
+    if not hasattr(storage, "replication_stats"):
+        raise HTTPException(status_code=404, detail="Write-behind replication is not enabled")
+    return await run_in_threadpool(storage.replication_stats)
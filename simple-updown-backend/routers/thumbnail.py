@@ -2,19 +2,31 @@ import os
 import io
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import FileResponse
-from dependencies import db, storage, storage_type
+from compression import decompress_stream
+from dependencies import THUMBNAIL_DIR, db, storage, storage_type
+from tracing import span
 from utils import is_image_file, is_image_content_type
 
 router = APIRouter()
 
-try:
-    from PIL import Image
-except ImportError:
-    Image = None
+_pil_image = None
+
+
+def _load_pil():
+    """Pillow는 첫 썸네일 요청 시점에 import (미설치 시 None)"""
+    global _pil_image
+    if _pil_image is None:
+        try:
+            from PIL import Image
+        except ImportError:
+            return None
+        _pil_image = Image
+    return _pil_image
 
 
 @router.get("/thumbnail/{file_hash}")
 async def get_thumbnail(file_hash: str, width: int = 100, height: int = 100):
+    Image = _load_pil()
     if Image is None:
         raise HTTPException(status_code=400, detail="Thumbnail generation not available - Pillow not installed")
 
@@ -32,11 +44,10 @@ async def get_thumbnail(file_hash: str, width: int = 100, height: int = 100):
     if not (is_image_file(file_name) or is_image_content_type(content_type)):
         raise HTTPException(status_code=400, detail="Not an image file")
 
-    thumbnail_dir = os.path.join(os.path.dirname(storage.upload_dir), "thumbnails")
-    os.makedirs(thumbnail_dir, exist_ok=True)
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
 
     cache_key = f"{file_hash}_{width}x{height}"
-    thumbnail_path = os.path.join(thumbnail_dir, cache_key)
+    thumbnail_path = os.path.join(THUMBNAIL_DIR, cache_key)
 
     img_format = "JPEG"
     mime_type = "image/jpeg"
@@ -54,8 +65,10 @@ async def get_thumbnail(file_hash: str, width: int = 100, height: int = 100):
             headers={"Cache-Control": "max-age=3600, public"},
         )
 
+    content_encoding = file_metadata.get("content_encoding")
+
     try:
-        if storage_type == "local":
+        if storage_type == "local" and not content_encoding:
             file_path = os.path.join(storage.upload_dir, file_hash)
             if not os.path.exists(file_path):
                 raise HTTPException(status_code=404, detail="Image file not found")
@@ -64,24 +77,28 @@ async def get_thumbnail(file_hash: str, width: int = 100, height: int = 100):
             img_bytes = storage.get_file_bytes(file_hash)
             if not img_bytes:
                 raise HTTPException(status_code=404, detail="Image data not found")
+            if content_encoding:
+                img_bytes = b"".join(decompress_stream([img_bytes], content_encoding))
             img_source = io.BytesIO(img_bytes)
 
         with Image.open(img_source) as img:
-            if img.mode not in ('RGB', 'RGBA'):
-                img = img.convert('RGB')
-            if max(img.width, img.height) > 2000:
-                factor = 2000 / max(img.width, img.height)
-                img = img.resize(
-                    (int(img.width * factor), int(img.height * factor)),
-                    Image.LANCZOS,
-                )
-            img.thumbnail((width, height), Image.LANCZOS)
-            if img.mode == 'RGBA' and img_format == 'JPEG':
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                background.paste(img, mask=img.split()[3])
-                img = background
-            save_options = {'quality': 85, 'optimize': True} if img_format == 'JPEG' else {'optimize': True}
-            img.save(thumbnail_path, format=img_format, **save_options)
+            with span("thumbnail.decode"):
+                if img.mode not in ('RGB', 'RGBA'):
+                    img = img.convert('RGB')
+                if max(img.width, img.height) > 2000:
+                    factor = 2000 / max(img.width, img.height)
+                    img = img.resize(
+                        (int(img.width * factor), int(img.height * factor)),
+                        Image.LANCZOS,
+                    )
+                img.thumbnail((width, height), Image.LANCZOS)
+                if img.mode == 'RGBA' and img_format == 'JPEG':
+                    background = Image.new('RGB', img.size, (255, 255, 255))
+                    background.paste(img, mask=img.split()[3])
+                    img = background
+            with span("thumbnail.encode"):
+                save_options = {'quality': 85, 'optimize': True} if img_format == 'JPEG' else {'optimize': True}
+                img.save(thumbnail_path, format=img_format, **save_options)
 
         return FileResponse(
             thumbnail_path,
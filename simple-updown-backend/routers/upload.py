@@ -1,3 +1,5 @@
+import os
+import time
 import hashlib
 import tempfile
 import datetime
@@ -5,8 +7,13 @@ import uuid
 import traceback
 from datetime import timedelta
 from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from compression import get_storage_encoding, is_compressible, compress_file, COMPRESSION_MIN_SIZE
+from deletion import deletion_gate
 from dependencies import db, storage
-from utils import format_file_size
+from digests import inline_digests, pending_digests
+from tracing import record, span
+from utils import format_file_size, get_ip_prefix
 
 router = APIRouter()
 
@@ -18,7 +25,7 @@ async def upload_file(
     request: Request = None,
 ):
     client_ip = request.client.host if request else "unknown"
-    ip_prefix = '.'.join(client_ip.split('.')[:2]) if '.' in client_ip else client_ip
+    ip_prefix = get_ip_prefix(client_ip)
 
     if not isinstance(expire_in_minutes, int):
         expire_in_minutes = 5
@@ -30,26 +37,27 @@ async def upload_file(
     file_hash = None
     file_size = 0
     temp_file_path = None
+    compressed_path = None
 
     try:
         temp_dir = tempfile.gettempdir()
         temp_file_path = os.path.join(temp_dir, f"upload_{uuid.uuid4().hex}.tmp")
 
-        md5_obj = hashlib.md5()
-        sha1_obj = hashlib.sha1()
-        sha256_obj = hashlib.sha256()
+        hashers = {name: hashlib.new(name) for name in inline_digests()}
 
         chunk_size = 8 * 1024 * 1024
         processed_size = 0
+        hash_seconds = 0.0
 
         with open(temp_file_path, 'wb') as temp_file:
             while True:
                 chunk = await file.read(chunk_size)
                 if not chunk:
                     break
-                md5_obj.update(chunk)
-                sha1_obj.update(chunk)
-                sha256_obj.update(chunk)
+                hash_start = time.perf_counter()
+                for hasher in hashers.values():
+                    hasher.update(chunk)
+                hash_seconds += time.perf_counter() - hash_start
                 temp_file.write(chunk)
                 temp_file.flush()
                 file_size += len(chunk)
@@ -58,16 +66,26 @@ async def upload_file(
                     print(f"업로드 진행 중: {format_file_size(file_size)} 처리됨")
                     processed_size = 0
 
+        record("upload.hash", hash_seconds * 1000)
+
         if file_size <= 0:
             raise HTTPException(status_code=400, detail="Empty file cannot be uploaded")
 
-        md5_hash = md5_obj.hexdigest()
-        sha1_hash = sha1_obj.hexdigest()
-        file_hash = sha256_obj.hexdigest()
-        del md5_obj, sha1_obj, sha256_obj
-
-        if not storage.upload_file(temp_file_path, file_hash):
-            raise HTTPException(status_code=500, detail="Failed to store file")
+        digests = {name: hasher.hexdigest() for name, hasher in hashers.items()}
+        file_hash = digests["sha256"]
+        del hashers
+
+        content_encoding = None
+        stored_size = file_size
+        upload_path = temp_file_path
+        encoding = get_storage_encoding() if getattr(storage, "compress_at_rest", True) else None
+        if encoding and file_size >= COMPRESSION_MIN_SIZE and is_compressible(file.content_type, file.filename):
+            with span("upload.compress"):
+                compressed_path = await run_in_threadpool(compress_file, temp_file_path, encoding)
+            if compressed_path:
+                content_encoding = encoding
+                stored_size = os.path.getsize(compressed_path)
+                upload_path = compressed_path
 
         now = datetime.datetime.utcnow()
         expire_time = now + timedelta(days=36500) if is_unlimited else now + timedelta(minutes=expire_in_minutes)
@@ -77,14 +95,31 @@ async def upload_file(
             "file_size": file_size,
             "formatted_size": format_file_size(file_size),
             "content_type": file.content_type,
-            "hash": {"md5": md5_hash, "sha1": sha1_hash, "sha256": file_hash},
+            "hash": {"md5": digests.get("md5"), "sha1": digests.get("sha1"), "sha256": file_hash},
+            "pending_digests": pending_digests(),
             "expire_time": expire_time.isoformat() + "Z",
             "date": now.isoformat() + "Z",
             "uploader_ip": ip_prefix,
             "expire_minutes": expire_in_minutes,
+            "content_encoding": content_encoding,
+            "stored_size": stored_size,
         }
 
-        await db.insert(metadata)
+        # 같은 해시는 한 번에 하나의 업로드만 저장/등록, 리퍼가 지우는 중이면 끝난 뒤 처리
+        async with deletion_gate.uploading(file_hash):
+            existing = await db.get_by_hash(file_hash)
+            if existing is not None and await run_in_threadpool(storage.file_exists, file_hash):
+                # 이미 저장된 내용: 객체를 다시 쓰지 않고 기존 메타데이터(content_encoding 포함) 유지
+                metadata = existing[1]
+            else:
+                if existing is not None:
+                    # 객체가 사라진 메타데이터는 삭제 표시 후 새로 등록
+                    await db.delete(existing[0])
+                # 청크 저장소는 CDC 분할/해시/기록까지 수행하므로 이벤트 루프를 막지 않도록 스레드풀에서 실행
+                if not await run_in_threadpool(storage.upload_file, upload_path, file_hash):
+                    raise HTTPException(status_code=500, detail="Failed to store file")
+                if await db.insert(metadata) is None:
+                    raise HTTPException(status_code=500, detail="Failed to record file metadata")
 
         base_url = str(request.base_url).rstrip("/")
         share_url = f"{base_url}/download/{file_hash}"
@@ -94,10 +129,11 @@ async def upload_file(
             "message": "File uploaded successfully.",
             "redirect_to": "/files/",
             "file_info": {
-                "file_name": file.filename,
-                "file_size": file_size,
-                "formatted_size": format_file_size(file_size),
+                "file_name": metadata["file_name"],
+                "file_size": metadata["file_size"],
+                "formatted_size": format_file_size(metadata["file_size"]),
                 "hash": file_hash,
+                "pending_digests": metadata["pending_digests"],
                 "share_url": share_url,
             },
         }
@@ -108,9 +144,10 @@ async def upload_file(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error uploading file: {str(e)}")
     finally:
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-            except Exception as e:
-                print(f"임시 파일 삭제 실패: {str(e)}")
+        for path in (temp_file_path, compressed_path):
+            if path and os.path.exists(path):
+                try:
+                    os.unlink(path)
+                except Exception as e:
+                    print(f"임시 파일 삭제 실패: {str(e)}")
         await file.close()
@@ -0,0 +1,122 @@
+import os
+import time
+import functools
+import inspect
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+# 장시간 유지되는 스트림(SSE)은 느린 요청 로그에서 제외
+_UNTRACED_PATHS = {"/api/files/events"}
+
+# 요청별 (span 이름, 소요 ms) 목록, 요청 밖(스케줄러 등)에서는 None
+_current_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("trace_spans", default=None)
+
+
+def record(name: str, elapsed_ms: float) -> None:
+    spans = _current_spans.get()
+    if spans is not None:
+        spans.append((name, elapsed_ms))
+
+
+@contextmanager
+def span(name: str):
+    if _current_spans.get() is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, (time.perf_counter() - start) * 1000)
+
+
+def traced_iter(name: str, iterator) -> Iterator:
+    """이터레이터의 next() 호출에 걸린 시간만 합산해 하나의 span으로 기록"""
+    if iterator is None:
+        return
+    elapsed = 0.0
+    iterator = iter(iterator)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        record(name, elapsed * 1000)
+
+
+def traced(name: str):
+    """동기/비동기 함수 호출을 span으로 기록하는 데코레이터"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def summarize(spans: List[Tuple[str, float]]) -> Dict[str, Dict[str, float]]:
+    summary: Dict[str, Dict[str, float]] = {}
+    for name, elapsed_ms in spans:
+        entry = summary.setdefault(name, {"ms": 0.0, "count": 0})
+        entry["ms"] += elapsed_ms
+        entry["count"] += 1
+    return summary
+
+
+class TracingMiddleware:
+    """요청 단위 span 수집, Server-Timing 헤더 추가 및 느린 요청 로깅
+
+    응답 스트리밍이 끝날 때까지를 요청 시간으로 본다.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"] in _UNTRACED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        spans: List[Tuple[str, float]] = []
+        token = _current_spans.set(spans)
+        start = time.perf_counter()
+        status = [0]
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                timing = ", ".join(
+                    f"{name.replace('.', '-')};dur={value['ms']:.1f}"
+                    for name, value in summarize(spans).items()
+                )
+                if timing:
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_spans.reset(token)
+            total_ms = (time.perf_counter() - start) * 1000
+            if total_ms >= SLOW_REQUEST_MS:
+                breakdown = ", ".join(
+                    f"{name}={value['ms']:.1f}ms x{value['count']}"
+                    for name, value in sorted(summarize(spans).items(), key=lambda item: -item[1]["ms"])
+                )
+                print(f"느린 요청: {scope['method']} {scope['path']} {status[0]} {total_ms:.1f}ms [{breakdown}]")
@@ -23,3 +23,7 @@ def is_image_file(filename: str) -> bool:
 
 def is_image_content_type(content_type: str) -> bool:
     return bool(content_type and content_type.startswith('image/'))
+
+
+def get_ip_prefix(client_ip: str) -> str:
+    return '.'.join(client_ip.split('.')[:2]) if '.' in client_ip else client_ip
@@ -0,0 +1,245 @@
+import os
+import asyncio
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Set
+from starlette.concurrency import run_in_threadpool
+from database import DB_PATH
+from local_storage import LocalStorage
+from r2_storage import R2Storage
+
+REPLICATION_CONCURRENCY = int(os.getenv("REPLICATION_CONCURRENCY", "2"))
+REPLICATION_POLL_SECONDS = float(os.getenv("REPLICATION_POLL_SECONDS", "1"))
+REPLICATION_RETRY_BASE_SECONDS = 5
+REPLICATION_RETRY_MAX_SECONDS = 600
+
+
+def _fsync_file(path: str) -> None:
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+    dir_fd = os.open(os.path.dirname(path), os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+class WriteBehindStorage:
+    """로컬 스테이징 후 R2로 비동기 복제하는 write-behind 저장소
+
+    업로드는 로컬 디스크에 fsync된 시점에 완료로 응답하고, SQLite 복제 큐에 등록된
+    항목을 백그라운드 워커가 R2로 올린다. 복제 완료 전까지는 스테이징 사본으로 서비스하며
+    완료 후 스테이징 사본을 삭제한다.
+    """
+
+    def __init__(self, staging: LocalStorage, remote: R2Storage, db_path: str = DB_PATH) -> None:
+        self.staging = staging
+        self.remote = remote
+        self.upload_dir = staging.upload_dir
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS replication_queue (
+                file_hash TEXT PRIMARY KEY,
+                generation TEXT NOT NULL,
+                enqueued_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_replication_due ON replication_queue(next_attempt_at)"
+        )
+        self._conn.commit()
+
+    def _staged_path(self, file_hash: str) -> str:
+        return os.path.join(self.staging.upload_dir, file_hash)
+
+    def upload_file(self, file_path: str, file_hash: str) -> bool:
+        if not self.staging.upload_file(file_path, file_hash):
+            return False
+        try:
+            _fsync_file(self._staged_path(file_hash))
+            now = time.time()
+            with self._lock:
+                self._conn.execute(
+                    """
+                    INSERT OR REPLACE INTO replication_queue
+                        (file_hash, generation, enqueued_at, attempts, next_attempt_at, last_error)
+                    VALUES (?, ?, ?, 0, ?, NULL)
+                    """,
+                    (file_hash, uuid.uuid4().hex, now, now),
+                )
+                self._conn.commit()
+            return True
+        except Exception as e:
+            print(f"복제 큐 등록 실패: {str(e)}")
+            self.staging.delete_file(file_hash)
+            return False
+
+    def due_items(self, limit: int) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_hash FROM replication_queue WHERE next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                (time.time(), limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def replicate(self, file_hash: str) -> bool:
+        """스테이징 사본 하나를 R2로 복제, 성공 시 큐에서 제거하고 스테이징 공간 회수"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT generation, attempts FROM replication_queue WHERE file_hash = ?", (file_hash,)
+            ).fetchone()
+        if row is None:
+            return True
+        generation, attempts = row
+        staged_path = self._staged_path(file_hash)
+        if not os.path.exists(staged_path):
+            self._finish(file_hash, generation)
+            return False
+
+        try:
+            uploaded = self.remote.upload_file(staged_path, file_hash)
+            error = None if uploaded else "R2 upload failed"
+        except Exception as e:
+            uploaded = False
+            error = str(e)
+
+        if uploaded:
+            with self._lock:
+                done = self._conn.execute(
+                    "DELETE FROM replication_queue WHERE file_hash = ? AND generation = ?",
+                    (file_hash, generation),
+                ).rowcount
+                still_exists = done or self._conn.execute(
+                    "SELECT 1 FROM replication_queue WHERE file_hash = ?", (file_hash,)
+                ).fetchone() is not None
+                self._conn.commit()
+                if done:
+                    self.staging.delete_file(file_hash)
+            if not still_exists:
+                # 복제 중 삭제된 파일: 방금 올린 객체 정리
+                self.remote.delete_file(file_hash)
+            return True
+
+        delay = min(REPLICATION_RETRY_BASE_SECONDS * 2 ** attempts, REPLICATION_RETRY_MAX_SECONDS)
+        with self._lock:
+            self._conn.execute(
+                """
+                UPDATE replication_queue
+                SET attempts = attempts + 1, next_attempt_at = ?, last_error = ?
+                WHERE file_hash = ? AND generation = ?
+                """,
+                (time.time() + delay, error, file_hash, generation),
+            )
+            self._conn.commit()
+        return False
+
+    def _finish(self, file_hash: str, generation: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM replication_queue WHERE file_hash = ? AND generation = ?",
+                (file_hash, generation),
+            )
+            self._conn.commit()
+
+    def file_exists(self, file_hash: str) -> bool:
+        return self.staging.file_exists(file_hash) or self.remote.file_exists(file_hash)
+
+    def stream_file(self, file_hash: str, chunk_size: int = 1024 * 1024):
+        try:
+            f = open(self._staged_path(file_hash), "rb")
+        except FileNotFoundError:
+            yield from self.remote.stream_file(file_hash, chunk_size)
+            return
+        # 열린 파일은 복제 완료로 스테이징 사본이 삭제되어도 끝까지 읽을 수 있음
+        with f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    def get_file_bytes(self, file_hash: str):
+        if self.staging.file_exists(file_hash):
+            data = self.staging.get_file_bytes(file_hash)
+            if data is not None:
+                return data
+        return self.remote.get_file_bytes(file_hash)
+
+    def delete_file(self, file_hash: str) -> bool:
+        with self._lock:
+            self._conn.execute("DELETE FROM replication_queue WHERE file_hash = ?", (file_hash,))
+            self._conn.commit()
+        staged_deleted = self.staging.delete_file(file_hash)
+        remote_deleted = self.remote.delete_file(file_hash)
+        return staged_deleted or remote_deleted
+
+    def delete_files(self, file_hashes: List[str]) -> Dict[str, str]:
+        """복제 대기 항목과 스테이징 사본을 지우고 R2 객체는 일괄 삭제"""
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM replication_queue WHERE file_hash = ?", [(h,) for h in file_hashes]
+            )
+            self._conn.commit()
+        failures = self.staging.delete_files(file_hashes)
+        failures.update(self.remote.delete_files(file_hashes))
+        return failures
+
+    def replication_stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            depth, oldest, failing, max_attempts = self._conn.execute(
+                """
+                SELECT COUNT(*), MIN(enqueued_at),
+                       COALESCE(SUM(attempts > 0), 0), COALESCE(MAX(attempts), 0)
+                FROM replication_queue
+                """
+            ).fetchone()
+        return {
+            "queue_depth": depth,
+            "lag_seconds": round(now - oldest, 3) if oldest else 0.0,
+            "failing": failing,
+            "max_attempts": max_attempts,
+            "concurrency": REPLICATION_CONCURRENCY,
+        }
+
+
+async def run_replication_worker(storage) -> None:
+    """복제 큐를 폴링해 최대 REPLICATION_CONCURRENCY개씩 병렬로 R2에 복제"""
+    semaphore = asyncio.Semaphore(REPLICATION_CONCURRENCY)
+    in_flight: Set[str] = set()
+    tasks: Set[asyncio.Task] = set()
+
+    async def replicate_one(file_hash: str) -> None:
+        try:
+            await run_in_threadpool(storage.replicate, file_hash)
+        except Exception as e:
+            print(f"R2 복제 오류 ({file_hash}): {str(e)}")
+        finally:
+            in_flight.discard(file_hash)
+            semaphore.release()
+
+    while True:
+        started = False
+        try:
+            due = await run_in_threadpool(storage.due_items, REPLICATION_CONCURRENCY * 4)
+        except Exception as e:
+            # 일시적인 큐 조회 오류(database is locked 등)로 워커가 멈추지 않도록 기록 후 재시도
+            print(f"복제 큐 조회 오류: {str(e)}")
+            await asyncio.sleep(REPLICATION_POLL_SECONDS)
+            continue
+        for file_hash in due:
+            if file_hash in in_flight:
+                continue
+            await semaphore.acquire()
+            in_flight.add(file_hash)
+            task = asyncio.create_task(replicate_one(file_hash))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            started = True
+        if not started:
+            await asyncio.sleep(REPLICATION_POLL_SECONDS)
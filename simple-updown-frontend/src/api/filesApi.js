@@ -9,16 +9,41 @@ export async function fetchFiles() {
   return response.data
 }
 
+export async function fetchChanges(since) {
+  const response = await api.get('/api/files/changes', { params: { since } })
+  return response.data
+}
+
+export function subscribeFileEvents(since, { onChange, onReset, onError }) {
+  const source = new EventSource(`/api/files/events?since=${since}`)
+  source.addEventListener('change', event => onChange(JSON.parse(event.data)))
+  source.addEventListener('reset', event => onReset(JSON.parse(event.data)))
+  source.onerror = onError
+  return source
+}
+
+const UPLOAD_MAX_RETRIES = 5
+
 export async function uploadFile(file, expireMinutes, onProgress) {
   const minutes = parseInt(expireMinutes, 10)
   const formData = new FormData()
   formData.append('file', file)
   formData.append('expire_in_minutes', minutes)
-  const response = await api.post(`/upload/?expire_in_minutes=${minutes}`, formData, {
-    headers: { 'Content-Type': 'multipart/form-data' },
-    onUploadProgress: onProgress,
-  })
-  return response.data
+  for (let attempt = 0; ; attempt++) {
+    try {
+      const response = await api.post(`/upload/?expire_in_minutes=${minutes}`, formData, {
+        headers: { 'Content-Type': 'multipart/form-data' },
+        onUploadProgress: onProgress,
+      })
+      return response.data
+    } catch (error) {
+      // 동시 업로드 제한(429/503)은 Retry-After 만큼 기다린 뒤 재시도
+      const status = error.response?.status
+      if ((status !== 429 && status !== 503) || attempt >= UPLOAD_MAX_RETRIES) throw error
+      const retryAfter = parseInt(error.response.headers['retry-after'], 10) || 5
+      await new Promise(resolve => setTimeout(resolve, retryAfter * 1000))
+    }
+  }
 }
 
 export async function deleteFile(fileHash) {